@@ -3,475 +3,4163 @@
 import sys
 import json
 import os
+import time
+import functools
+import enum
+import bisect
+import itertools
+import heapq
+import re
+import fnmatch
+import collections
+import struct
+import zlib
+import threading
+import signal
+import gc
+
+class Status(enum.IntEnum):
+    """
+    Status of a task, kept in the lowest bit of its flags in the task store.
+    """
+    UNFINISHED = 0
+    COMPLETE = 1
+
+    def __str__(self):
+        return self.name.capitalize()
+
+# Other flags of a task in the task store
+PINNED = 2
+SECRET = 4
+TRASHED = 8
+
+# Flags of the tasks whose due date and reminder are put aside
+UNSCHEDULED = Status.COMPLETE | TRASHED | SECRET
+
+# Size of the chunks written when a listing is streamed to a pipe or a file
+OUTPUT_CHUNK_SIZE = 64 * 1024
+# Upper bounds (in seconds) of the buckets of the command latency histograms,
+# the last bucket holding the longer calls
+LATENCY_BUCKETS = (0.0001, 0.001, 0.01, 0.1, 1.0)
+LATENCY_LABELS = ("<0.1ms", "<1ms", "<10ms", "<100ms", "<1s", ">=1s")
+
+# Seconds during which the secret tasks stay unlocked
+UNLOCK_TIMEOUT = 15 * 60
+
+# Commands of the history kept in memory, the older ones are in the history file
+HISTORY_SIZE = 1000
+
+# Dates kept for the tasks (as time stamps), by their name in the save file
+DATE_LISTS = ("due", "reminders")
+# Attributes of the tasks saved next to the lists, as dicts by task
+TASK_ATTRIBUTES = DATE_LISTS + ("tags",)
+# Longest wait of the reminder timer, in case the clock changes
+REMINDER_MAX_WAIT = 60.0
+
+# Commands which can be undone, and then redone
+UNDO_SIZE = 100
+
+# Task names offered at most by the completion
+COMPLETION_LIMIT = 50
+# Edits (inserted, deleted or replaced characters) the fuzzy resolver
+# allows between a misspelt task name and the task it suggests
+FUZZY_DISTANCE = 2
+
+# Columns of the CSV and JSON Lines files imported and exported
+ROW_FIELDS = ("name", "status", "pinned", "trashed", "due", "reminder", "tags")
+# Rows imported together, and read or written between two progress reports
+TRANSFER_BATCH_SIZE = 10000
+# Import errors displayed, the others are only counted
+MAX_IMPORT_ERRORS = 20
+
+# Workspace of the save file itself, the others being in the workspaces
+# directory next to it
+DEFAULT_WORKSPACE = "default"
+# Memory (in bytes) the workspaces kept loaded besides the current one may take
+WORKSPACE_CACHE_SIZE = 256 * 1024 * 1024
+
+# Status names by status bit, as displayed and saved
+STATUS_NAMES = tuple(str(status) for status in Status)
+
+# Flags mask and value selecting each list of tasks in the task store
+VIEWS = {
+    "tasks": (PINNED | SECRET | TRASHED, 0),
+    "important": (PINNED | SECRET | TRASHED, PINNED),
+    "secrets": (SECRET | TRASHED, SECRET),
+    "trash": (TRASHED, TRASHED),
+}
+
+# Every combination of status and flags, the task counters being kept by
+# combination
+FLAG_COMBINATIONS = 16
+
+def origin(flags: int):
+    """
+    Return the name of the list (in the save file) a task with :param flags:
+    belongs to, or was removed from if it is in the trash.
+    """
+    if flags & SECRET:
+        return "secrets"
+    if flags & PINNED:
+        return "important"
+    return "tasks"
+
+def hash_password(password: str):
+    """
+    Return the hash of a secret tasks :param password:, with its salt and
+    the parameters of the key derivation: "scrypt$n$r$p$salt$hash", or
+    "pbkdf2_sha256$iterations$salt$hash" if scrypt isn't available.
+    """
+    # Imported here so that PanCake starts faster when it isn't used
+    import hashlib
+
+    salt = os.urandom(16)
+    if hasattr(hashlib, "scrypt"):
+        n, r, p = 2 ** 14, 8, 1
+        key = hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p, maxmem=64 * 1024 * 1024, dklen=32)
+        return f"scrypt${n}${r}${p}${salt.hex()}${key.hex()}"
+    iterations = 600000
+    key = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+    return f"pbkdf2_sha256${iterations}${salt.hex()}${key.hex()}"
+
+def verify_password(password: str, password_hash: str):
+    """
+    Whether :param password: matches a :param password_hash: made by
+    hash_password.
+    """
+    import hashlib
+    import hmac
+
+    algorithm, *parameters, salt, key = password_hash.split("$")
+    salt = bytes.fromhex(salt)
+    if algorithm == "scrypt":
+        n, r, p = (int(parameter) for parameter in parameters)
+        derived = hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p, maxmem=64 * 1024 * 1024, dklen=32)
+    else:
+        derived = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, int(parameters[0]))
+    return hmac.compare_digest(derived.hex(), key)
+
+def parse_time(text: str, end_of_day: bool=False):
+    """
+    Return the time stamp of a date written as "2026-10-20",
+    "2026-10-20T18:00" (or "2026-10-20 18:00" written "2026-10-20_18:00"),
+    or relative to now, as "+30m", "+2h", "+3d" or "+1w".
+    :param end_of_day: whether a date without time means the end of the
+    day rather than its start
+    """
+    relative = re.fullmatch(r"\+(\d+)([mhdw])", text)
+    if relative:
+        amount, unit = relative.groups()
+        return int(time.time()) + int(amount) * {"m": 60, "h": 3600, "d": 86400, "w": 604800}[unit]
+    # Imported here so that PanCake starts faster when it isn't used
+    import datetime
+
+    try:
+        date = datetime.datetime.fromisoformat(text.replace("_", " "))
+    except ValueError:
+        raise PanCakeError(f"Invalid date: {text} (use 2026-10-20, 2026-10-20T18:00 or +2h).")
+    if end_of_day and len(text) == 10:
+        date = date.replace(hour=23, minute=59, second=59)
+    return int(date.timestamp())
+
+def format_time(stamp: int):
+    """
+    Return a time stamp as a local date and time.
+    """
+    return time.strftime("%Y-%m-%d %H:%M", time.localtime(stamp))
+
+def parse_flag(value):
+    """
+    Return the boolean written in an imported row: true, false (or
+    nothing), or in a CSV file "true", "false", "yes", "no", "1", "0" or
+    an empty field.
+    """
+    if value is None or isinstance(value, bool):
+        return bool(value)
+    text = str(value).strip().lower()
+    if text in ("true", "yes", "1"):
+        return True
+    if text in ("false", "no", "0", ""):
+        return False
+    raise PanCakeError(f"Invalid boolean: {value}.")
+
+def read_rows(path: str):
+    """
+    Read the rows of a CSV file (with a header line) or, for any other
+    extension, of a JSON Lines file, one at a time.
+    Yield the number of each row (its line) and its fields as a dict, or
+    the PanCakeError of a line which isn't a JSON object.
+    """
+    if path.endswith(".csv"):
+        # Imported here so that PanCake starts faster when it isn't used
+        import csv
+
+        with open(path, 'r', newline='', encoding="utf-8") as file:
+            reader = csv.DictReader(file)
+            try:
+                for row in reader:
+                    yield reader.line_num, row
+            except csv.Error as error:
+                raise PanCakeError(f"Invalid CSV file, line {reader.line_num}: {error}.")
+        return
+    with open(path, 'r', encoding="utf-8") as file:
+        for number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield number, PanCakeError("Invalid JSON.")
+                continue
+            yield number, row if isinstance(row, dict) else PanCakeError("A row must be a JSON object.")
+
+def write_rows(path: str, rows, progress=None):
+    """
+    Write :param rows: (dicts of ROW_FIELDS, the empty ones left out) as
+    they come in a CSV file or, for any other extension, in a JSON Lines
+    file. Like write_atomic, a temporary file is renamed over :param path:
+    once complete.
+    :param progress: called with the amount of rows written every
+    TRANSFER_BATCH_SIZE rows
+    Return the amount of rows written.
+    """
+    temporary_path = path + ".tmp"
+    count = 0
+    with open(temporary_path, 'w', newline='', encoding="utf-8") as file:
+        if path.endswith(".csv"):
+            import csv
+
+            writer = csv.DictWriter(file, ROW_FIELDS)
+            writer.writeheader()
+
+            def write(row: dict):
+                if "tags" in row:
+                    row["tags"] = " ".join(row["tags"])
+                writer.writerow(row)
+        else:
+            def write(row: dict):
+                file.write(json.dumps(row) + "\n")
+
+        for row in rows:
+            write(row)
+            count += 1
+            if progress is not None and count % TRANSFER_BATCH_SIZE == 0:
+                progress(count)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary_path, path)
+    return count
+
+def write_atomic(path: str, data):
+    """
+    Write :param data: as JSON (or as is if it is bytes) in :param path:
+    without ever leaving a partially written file: the data is written in a
+    temporary file which is synced and then renamed over :param path:.
+    Return the size of the file.
+    """
+    temporary_path = path + ".tmp"
+    with open(temporary_path, 'wb' if isinstance(data, bytes) else 'w') as temporary_file:
+        if isinstance(data, bytes):
+            temporary_file.write(data)
+        else:
+            json.dump(data, temporary_file)
+        temporary_file.flush()
+        os.fsync(temporary_file.fileno())
+        size = temporary_file.tell()
+    os.replace(temporary_path, path)
+    return size
+
+def trash_from_save(trash):
+    """
+    Return the trash as saved by PanCake: a dict mapping each removed task
+    to its previous status and origin ("tasks", "important" or "secrets").
+    Old save files, where the trash is a list of names, are migrated.
+    """
+    if isinstance(trash, dict):
+        return trash
+    return {task: {"status": "Unfinished", "origin": "tasks"} for task in trash}
+
+def default_save_file():
+    """
+    Return the save file used by default: saved_tasks.json, next to PanCake.
+    """
+    return os.path.join(os.path.dirname(os.path.realpath(__file__)), "saved_tasks.json")
+
+def store_from_save(data: dict):
+    """
+    Return the task store built from the lists of a save file :param data:.
+    If a name appears in several lists, the first one is kept.
+    A storage keeping the task store as is gives it under "store".
+    """
+    if "store" in data:
+        return data["store"]
+    store = {}
+    for key, flags in (("tasks", 0), ("important", PINNED), ("secrets", SECRET)):
+        for task, status in data.get(key, {}).items():
+            store.setdefault(task, flags | (Status.COMPLETE if status == "Complete" else Status.UNFINISHED))
+    for task, removed in trash_from_save(data.get("trash", {})).items():
+        flags = {"tasks": 0, "important": PINNED, "secrets": SECRET}[removed["origin"]]
+        store.setdefault(task, flags | TRASHED | (Status.COMPLETE if removed["status"] == "Complete" else Status.UNFINISHED))
+    return store
+
+class JSONStorage:
+    """
+    Default storage: the whole session is written in a single JSON file.
+    :param path: the save file
+    :param merged: the amount of changes of other sessions merged by the
+    last save or refresh, and how many of them conflicted with ours
+    """
+    merged = (0, 0)
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def record(self, operation: tuple):
+        """
+        Called by the task manager with every change made to the session.
+        The whole session is written at each save, so there is nothing to do.
+        """
+
+    def invalidate(self):
+        """
+        Called by the task manager when it has changed the session without
+        recording the changes, so the whole session has to be written at
+        the next save.
+        """
+
+    def checkpoint(self, manager):
+        """
+        Called by the task manager after each command.
+        """
+
+    def save(self, manager):
+        """
+        Save the session of :param manager:.
+        Return the amount of bytes written.
+        """
+        return self.prepare(manager)()
+
+    def prepare(self, manager):
+        """
+        Take what has to be written to save the session of :param manager:
+        and return a function writing it, which returns the amount of bytes
+        written. Only this first step needs the session not to change: the
+        writing can be done while other commands are run.
+        """
+        data = manager.snapshot()
+        return lambda: write_atomic(self.path, data)
+
+    def load(self):
+        """
+        Read the save file and return the session data.
+        """
+        with open(self.path, 'r') as save_file:
+            return json.load(save_file)
+
+    def refresh(self, manager):
+        """
+        Pick up the changes made to the save file by other sessions.
+        """
+        raise PanCakeError("Only the shared storage can be refreshed (--storage shared).")
+
+    def counters(self):
+        """
+        Return the amount of completed and unfinished tasks saved, reading
+        as little as the storage allows, or None if the save file was
+        written without the counters.
+        """
+        data = self.load()
+        if "complete" not in data or "unfinished" not in data:
+            return None
+        return data["complete"], data["unfinished"]
+
+    def files(self):
+        """
+        Return the files written by the storage.
+        """
+        return [self.path]
+
+    def size(self):
+        """
+        Return the size of the files written by the storage, in bytes.
+        """
+        return sum(os.path.getsize(path) for path in self.files() if os.path.exists(path))
+
+class JournalStorage(JSONStorage):
+    """
+    Write-ahead journal storage: a snapshot of the session (the usual save
+    file) plus a journal where each change is appended as one JSON line.
+    Saving only appends the changes made since the last save; once the
+    journal is bigger than :param threshold: bytes, it is compacted into a
+    new snapshot at the next save.
+    The first line of the journal holds the id of the snapshot it applies
+    to, so a journal left behind by an interrupted compaction, or by a save
+    made with the JSON storage, is ignored.
+    :param path: the snapshot file
+    :param threshold: the journal size (in bytes) triggering a compaction
+    """
+    def __init__(self, path: str, threshold: int=4 * 1024 * 1024):
+        super().__init__(path)
+        self.journal_path = path + ".journal"
+        self.threshold = threshold
+        self.snapshot_id = None
+        self.pending = []
+        # Whether the session has changes which aren't in the pending ones
+        self.invalidated = False
+
+    def record(self, operation: tuple):
+        """
+        Keep :param operation: until the next save.
+        """
+        if not self.invalidated:
+            self.pending.append(operation)
+
+    def invalidate(self):
+        """
+        Compact the journal at the next save, the pending changes being
+        part of the new snapshot.
+        """
+        self.invalidated = True
+        self.pending = []
+
+    def prepare(self, manager):
+        """
+        Take the pending changes of :param manager: to append them to the
+        journal, or its whole session to compact the journal if it doesn't
+        match the snapshot or has become too big at the previous save.
+        """
+        if self.snapshot_id is None or self.invalidated:
+            data = manager.snapshot()
+            self.pending = []
+            self.invalidated = False
+            return lambda: self.compact(data)
+        self.pending.append(("state", manager.settings()))
+        lines = "".join(json.dumps(operation) + "\n" for operation in self.pending)
+        self.pending = []
+        return lambda: self.append(lines)
+
+    def files(self):
+        """
+        Return the snapshot and the journal.
+        """
+        return [self.path, self.journal_path]
+
+    def append(self, lines: str):
+        """
+        Append some journal :param lines:. The journal is compacted at the
+        next save once it is bigger than the threshold.
+        """
+        with open(self.journal_path, 'a') as journal:
+            journal.write(lines)
+            journal.flush()
+            os.fsync(journal.fileno())
+            size = journal.tell()
+        if size > self.threshold:
+            self.snapshot_id = None
+        return len(lines.encode("utf-8"))
+
+    def compact(self, data: dict):
+        """
+        Write a new snapshot with the session :param data: and start a new
+        journal.
+        """
+        snapshot_id = os.urandom(16).hex()
+        data["snapshot-id"] = snapshot_id
+        size = write_atomic(self.path, data)
+        header = json.dumps(("snapshot", snapshot_id)) + "\n"
+        with open(self.journal_path + ".tmp", 'w') as journal:
+            journal.write(header)
+            journal.flush()
+            os.fsync(journal.fileno())
+        os.replace(self.journal_path + ".tmp", self.journal_path)
+        self.snapshot_id = snapshot_id
+        return size + len(header)
+
+    def load(self):
+        """
+        Read the snapshot and replay the journal on it.
+        """
+        data = super().load()
+        self.snapshot_id = data.get("snapshot-id")
+        self.pending = []
+        self.invalidated = False
+        try:
+            with open(self.journal_path, 'r') as journal:
+                header = journal.readline()
+                if self.snapshot_id is None or not header.endswith("\n") or json.loads(header) != ["snapshot", self.snapshot_id]:
+                    self.snapshot_id = None
+                    return data
+                for line in journal:
+                    # A line without end has been cut by a crash while saving
+                    if not line.endswith("\n"):
+                        break
+                    self.replay(data, json.loads(line))
+        except FileNotFoundError:
+            self.snapshot_id = None
+        return data
+
+    @staticmethod
+    def replay(data: dict, operation: list):
+        """
+        Apply a journal :param operation: to the session :param data:.
+        """
+        kind = operation[0]
+        if kind == "set":
+            data.setdefault(operation[1], {})[operation[2]] = operation[3]
+        elif kind == "pop":
+            data.get(operation[1], {}).pop(operation[2], None)
+        elif kind == "trash-set":
+            data["trash"] = trash_from_save(data.get("trash", {}))
+            data["trash"].pop(operation[1], None)
+            data["trash"][operation[1]] = operation[2]
+        elif kind == "trash-pop":
+            data["trash"] = trash_from_save(data.get("trash", {}))
+            data["trash"].pop(operation[1], None)
+        elif kind == "trash-append":
+            # Journals written before the trash kept the previous status
+            JournalStorage.replay(data, ("trash-set", operation[1], {"status": "Unfinished", "origin": "tasks"}))
+        elif kind == "trash-remove":
+            JournalStorage.replay(data, ("trash-pop", operation[1]))
+        elif kind == "trash-clear":
+            data["trash"] = {}
+        elif kind == "history-append":
+            data.setdefault("history", []).append(operation[1])
+        elif kind == "history-clear":
+            data["history"] = []
+        elif kind == "secrets-clear":
+            data["secrets"] = {}
+        elif kind == "state":
+            data.update(operation[1])
+
+class SQLiteStorage(JSONStorage):
+    """
+    SQLite storage: the session is kept in a database next to the save file
+    (saved_tasks.db), with a table for the tasks, the secret tasks, the
+    trash and the settings. The history table is only read to move the
+    history of older versions to the history file.
+    Each change is written with a single indexed statement as soon as it
+    is made, and the changes of a command are committed together in one
+    transaction once the command is done (a command which hasn't changed
+    anything doesn't write), so nothing is lost without a save. The
+    commands don't read the database: the whole session is read in memory
+    when it is loaded, which is slower than reading the JSON save file.
+    Only the counters of a session which isn't loaded are read from the
+    settings table (see counters).
+    If the database doesn't exist yet, the JSON save file is imported.
+    :param path: the JSON save file
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tasks (list TEXT NOT NULL, name TEXT NOT NULL, status TEXT NOT NULL, PRIMARY KEY (list, name));
+        CREATE INDEX IF NOT EXISTS tasks_name ON tasks (name);
+        CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status);
+        CREATE TABLE IF NOT EXISTS secrets (name TEXT PRIMARY KEY, status TEXT NOT NULL);
+        CREATE INDEX IF NOT EXISTS secrets_status ON secrets (status);
+        CREATE TABLE IF NOT EXISTS trash (position INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, status TEXT NOT NULL DEFAULT 'Unfinished', origin TEXT NOT NULL DEFAULT 'tasks');
+        CREATE INDEX IF NOT EXISTS trash_name ON trash (name);
+        CREATE TABLE IF NOT EXISTS history (position INTEGER PRIMARY KEY AUTOINCREMENT, command TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS dates (list TEXT NOT NULL, name TEXT NOT NULL, time INTEGER NOT NULL, PRIMARY KEY (list, name));
+        CREATE TABLE IF NOT EXISTS tags (name TEXT NOT NULL, tag TEXT NOT NULL, PRIMARY KEY (name, tag));
+        CREATE INDEX IF NOT EXISTS tags_tag ON tags (tag);
+    """
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self.database_path = os.path.splitext(path)[0] + ".db"
+        self.connection = None
+        # Changes are only written once the database matches the session,
+        # which means after a load or a first full save
+        self.synced = False
+        # The settings as they are in the database, if known
+        self.written_settings = None
+
+    def connect(self):
+        """
+        Open the database and create its tables if needed.
+        """
+        if self.connection is None:
+            # Imported here so that PanCake starts faster when it isn't used
+            import sqlite3
+            # Used by the autosave thread too, always under the lock of the task manager
+            self.connection = sqlite3.connect(self.database_path, check_same_thread=False)
+            self.connection.executescript(self.SCHEMA)
+            # Databases made before the trash kept the previous status and origin
+            columns = {column[1] for column in self.connection.execute("PRAGMA table_info(trash)")}
+            if "origin" not in columns:
+                self.connection.execute("ALTER TABLE trash ADD COLUMN status TEXT NOT NULL DEFAULT 'Unfinished'")
+                self.connection.execute("ALTER TABLE trash ADD COLUMN origin TEXT NOT NULL DEFAULT 'tasks'")
+                self.connection.commit()
+        return self.connection
+
+    def record(self, operation: tuple):
+        """
+        Write :param operation: in the database.
+        """
+        if not self.synced:
+            return
+        connection = self.connect()
+        kind = operation[0]
+        if kind == "set" and operation[1] in DATE_LISTS:
+            connection.execute("INSERT OR REPLACE INTO dates (list, name, time) VALUES (?, ?, ?)", operation[1:])
+        elif kind == "pop" and operation[1] in DATE_LISTS:
+            connection.execute("DELETE FROM dates WHERE list = ? AND name = ?", operation[1:])
+        elif kind in ("set", "pop") and operation[1] == "tags":
+            connection.execute("DELETE FROM tags WHERE name = ?", operation[2:3])
+            if kind == "set":
+                connection.executemany("INSERT INTO tags (name, tag) VALUES (?, ?)", ((operation[2], tag) for tag in operation[3]))
+        elif kind == "set" and operation[1] == "secrets":
+            connection.execute("INSERT INTO secrets (name, status) VALUES (?, ?) ON CONFLICT (name) DO UPDATE SET status = excluded.status", operation[2:])
+        elif kind == "set":
+            connection.execute("INSERT INTO tasks (list, name, status) VALUES (?, ?, ?) ON CONFLICT (list, name) DO UPDATE SET status = excluded.status", operation[1:])
+        elif kind == "pop" and operation[1] == "secrets":
+            connection.execute("DELETE FROM secrets WHERE name = ?", operation[2:])
+        elif kind == "pop":
+            connection.execute("DELETE FROM tasks WHERE list = ? AND name = ?", operation[1:])
+        elif kind == "trash-set":
+            connection.execute("DELETE FROM trash WHERE name = ?", operation[1:2])
+            connection.execute("INSERT INTO trash (name, status, origin) VALUES (?, ?, ?)", (operation[1], operation[2]["status"], operation[2]["origin"]))
+        elif kind == "trash-pop":
+            connection.execute("DELETE FROM trash WHERE name = ?", operation[1:])
+        elif kind == "trash-clear":
+            connection.execute("DELETE FROM trash")
+        elif kind == "history-append":
+            connection.execute("INSERT INTO history (command) VALUES (?)", operation[1:])
+        elif kind == "history-clear":
+            connection.execute("DELETE FROM history")
+        elif kind == "secrets-clear":
+            connection.execute("DELETE FROM secrets")
+
+    def invalidate(self):
+        """
+        Write the whole session at the next save, the changes written
+        since the last commit being rewritten with it.
+        """
+        self.synced = False
+
+    def counters(self):
+        """
+        Read the counters from the settings table.
+        """
+        if not os.path.exists(self.database_path):
+            return super().counters()
+        settings = dict(self.connect().execute("SELECT key, value FROM settings WHERE key IN ('complete', 'unfinished')"))
+        if len(settings) < 2:
+            return None
+        return json.loads(settings["complete"]), json.loads(settings["unfinished"])
+
+    def files(self):
+        """
+        Return the database.
+        """
+        return [self.database_path]
+
+    def write_settings(self, manager):
+        """
+        Write the counters and the settings of :param manager:, if they
+        have changed.
+        """
+        settings = manager.settings()
+        if settings == self.written_settings:
+            return
+        connection = self.connect()
+        connection.executemany(
+            "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+            [(key, json.dumps(value)) for key, value in settings.items()]
+        )
+        # The password was kept in plain text by older versions
+        connection.execute("DELETE FROM settings WHERE key = 'secrets-password'")
+        self.written_settings = settings
+
+    def checkpoint(self, manager):
+        """
+        Commit the changes made by the last command.
+        """
+        if self.synced:
+            self.commit(manager)
+
+    def commit(self, manager):
+        """
+        Write the settings of :param manager: and commit the transaction,
+        if anything has been written.
+        """
+        self.write_settings(manager)
+        if self.connection.in_transaction:
+            self.connection.commit()
+
+    def prepare(self, manager):
+        """
+        Commit the pending changes of :param manager:, or write the whole
+        session if the database doesn't match it yet. The changes are
+        written by SQLite before the commit returns, so there is nothing
+        left to write afterwards (and the amount of bytes isn't known).
+        """
+        if not self.synced:
+            self.write_all(manager.snapshot())
+            self.synced = True
+        else:
+            self.commit(manager)
+        return lambda: 0
+
+    def write_all(self, data: dict):
+        """
+        Replace the content of the database by the session :param data:.
+        """
+        connection = self.connect()
+        self.written_settings = None
+        with connection:
+            for table in ("tasks", "secrets", "trash", "history", "settings", "dates", "tags"):
+                connection.execute(f"DELETE FROM {table}")
+            for key in ("tasks", "important"):
+                connection.executemany(
+                    "INSERT OR REPLACE INTO tasks (list, name, status) VALUES (?, ?, ?)",
+                    ((key, task, status) for task, status in data.get(key, {}).items())
+                )
+            connection.executemany("INSERT OR REPLACE INTO secrets (name, status) VALUES (?, ?)", data.get("secrets", {}).items())
+            connection.executemany(
+                "INSERT INTO trash (name, status, origin) VALUES (?, ?, ?)",
+                ((task, removed["status"], removed["origin"]) for task, removed in trash_from_save(data.get("trash", {})).items())
+            )
+            connection.executemany("INSERT INTO history (command) VALUES (?)", ((command,) for command in data.get("history", [])))
+            for key in DATE_LISTS:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO dates (list, name, time) VALUES (?, ?, ?)",
+                    ((key, task, stamp) for task, stamp in data.get(key, {}).items())
+                )
+            connection.executemany(
+                "INSERT INTO tags (name, tag) VALUES (?, ?)",
+                ((task, tag) for task, tags in data.get("tags", {}).items() for tag in tags)
+            )
+            connection.executemany(
+                "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+                ((key, json.dumps(data[key])) for key in ("complete", "unfinished", "secrets-password-hash", "secrets-counts", "logs-status") if key in data)
+            )
+
+    def load(self):
+        """
+        Read the database, importing the JSON save file first if there is
+        no database yet.
+        """
+        if not os.path.exists(self.database_path):
+            self.write_all(super().load())
+        connection = self.connect()
+        data = {"tasks": {}, "important": {}}
+        for key, task, status in connection.execute("SELECT list, name, status FROM tasks ORDER BY rowid"):
+            data[key][task] = status
+        data["secrets"] = dict(connection.execute("SELECT name, status FROM secrets ORDER BY rowid"))
+        data["trash"] = {
+            task: {"status": status, "origin": origin}
+            for task, status, origin in connection.execute("SELECT name, status, origin FROM trash ORDER BY position")
+        }
+        data["history"] = [command for (command,) in connection.execute("SELECT command FROM history ORDER BY position")]
+        for key in DATE_LISTS:
+            data[key] = dict(connection.execute("SELECT name, time FROM dates WHERE list = ?", (key,)))
+        data["tags"] = {}
+        for task, tag in connection.execute("SELECT name, tag FROM tags ORDER BY rowid"):
+            data["tags"].setdefault(task, []).append(tag)
+        settings = {key: json.loads(value) for key, value in connection.execute("SELECT key, value FROM settings")}
+        data.update(settings)
+        self.written_settings = settings
+        self.synced = True
+        return data
+
+class BinaryStorage(JSONStorage):
+    """
+    Binary storage: the task store is written as is in a compact snapshot
+    next to the save file (saved_tasks.pancake), so loading it only builds
+    the task store, without any intermediate list.
+    The file starts with a fixed header holding the format version, the
+    counters, the amount of tasks, the size of each section and a CRC32 of
+    the rest of the file. Then come the settings (as JSON), the flags of
+    each task (one byte per task) and the task names, separated by line
+    breaks, in the order of the store.
+    If the snapshot doesn't exist yet, the JSON save file is imported.
+    :param path: the JSON save file
+    """
+    MAGIC = b"PANCAKE\x00"
+    VERSION = 1
+    # magic, version, complete, unfinished, tasks, settings size, names size, CRC32
+    HEADER = struct.Struct("<8sHqqQIQI")
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self.snapshot_path = os.path.splitext(path)[0] + ".pancake"
+
+    def prepare(self, manager):
+        """
+        Encode the task store (without the secret tasks, kept in their own
+        file) and the settings of :param manager:.
+        """
+        store = manager.store
+        if any(flags & (SECRET | TRASHED) == SECRET for flags in store.values()):
+            store = {task: flags for task, flags in store.items() if flags & (SECRET | TRASHED) != SECRET}
+        names = "\n".join(store).encode("utf-8")
+        if store and names.count(b"\n") != len(store) - 1:
+            raise PanCakeError("Task names can't contain line breaks with the binary storage.")
+        settings = manager.settings()
+        saved = {key: settings[key] for key in ("secrets-password-hash", "secrets-counts", "logs-status")}
+        # Few tasks have dates or tags, they are kept with the settings
+        saved.update((key, dict(manager.attribute(key))) for key in TASK_ATTRIBUTES)
+        encoded_settings = json.dumps(saved).encode("utf-8")
+        body = encoded_settings + bytes(store.values()) + names
+        header = self.HEADER.pack(
+            self.MAGIC, self.VERSION, settings["complete"], settings["unfinished"],
+            len(store), len(encoded_settings), len(names), zlib.crc32(body)
+        )
+        content = header + body
+        return lambda: write_atomic(self.snapshot_path, content)
+
+    def files(self):
+        """
+        Return the snapshot.
+        """
+        return [self.snapshot_path]
+
+    def header(self):
+        """
+        Read only the header of the snapshot and return its counters and its
+        amount of tasks, without reading the tasks.
+        """
+        with open(self.snapshot_path, 'rb') as snapshot:
+            return self.unpack_header(snapshot.read(self.HEADER.size))
+
+    def counters(self):
+        """
+        Read the counters from the header of the snapshot.
+        """
+        if not os.path.exists(self.snapshot_path):
+            return super().counters()
+        header = self.header()
+        return header["complete"], header["unfinished"]
+
+    def unpack_header(self, header: bytes):
+        """
+        Check and decode a snapshot :param header:.
+        """
+        if len(header) < self.HEADER.size:
+            raise ValueError("Truncated snapshot header.")
+        magic, version, complete, unfinished, tasks, settings_size, names_size, checksum = self.HEADER.unpack_from(header)
+        if magic != self.MAGIC:
+            raise ValueError("Not a PanCake snapshot.")
+        if version != self.VERSION:
+            raise ValueError(f"Unsupported snapshot version {version}.")
+        return {
+            "complete": complete, "unfinished": unfinished, "tasks": tasks,
+            "settings-size": settings_size, "names-size": names_size, "checksum": checksum,
+        }
+
+    def load(self):
+        """
+        Read the snapshot, importing the JSON save file first if there is
+        no snapshot yet. The task store is returned as is under "store".
+        """
+        try:
+            with open(self.snapshot_path, 'rb') as snapshot:
+                content = snapshot.read()
+        except FileNotFoundError:
+            return super().load()
+        header = self.unpack_header(content)
+        body = memoryview(content)[self.HEADER.size:]
+        if len(body) != header["settings-size"] + header["tasks"] + header["names-size"] or zlib.crc32(body) != header["checksum"]:
+            raise ValueError("Corrupted snapshot.")
+        flags_start = header["settings-size"]
+        names_start = flags_start + header["tasks"]
+        data = json.loads(bytes(body[:flags_start]))
+        names = str(body[names_start:], "utf-8").split("\n") if header["tasks"] else ()
+        flags = bytes(body[flags_start:names_start])
+        data["store"] = dict(zip(names, flags))
+        # Counted here, one byte value at a time, rather than task by task
+        data["counts"] = [flags.count(combination) for combination in range(FLAG_COMBINATIONS)]
+        data["complete"] = header["complete"]
+        data["unfinished"] = header["unfinished"]
+        return data
+
+class SharedStorage(JSONStorage):
+    """
+    Shared storage: the JSON save file can be used by several PanCake
+    processes at once. The file is read and written under a lock (fcntl,
+    so not on Windows) of a lock file next to it (saved_tasks.json.lock),
+    and each save increments the version kept in the file.
+    If another process has saved since this session was loaded, its
+    changes are merged task by task with ours: a task changed by only one
+    of the sessions keeps this change, and a task changed by both keeps
+    ours (a conflict). The counters are merged by adding the changes of
+    each session.
+    The session keeps the tasks as they were in the save file (the base
+    of the merge), which doubles the memory used by the task store.
+    :param path: the save file
+    :param version: the version of the save file the session is based on
+    :param base: the task store, the counters and the settings of that version
+    :param stat: the inode, modification time and size of the save file
+    when it was last read or written, to see if it has changed without
+    reading it
+    """
+    def __init__(self, path: str):
+        super().__init__(path)
+        self.stat = None
+        # Until the save file is loaded, the merge is based on an empty one
+        self.remember({"store": {}})
+
+    def locked(self, exclusive: bool):
+        """
+        Lock the save file and return the lock file, which unlocks it when
+        closed.
+        """
+        import fcntl
+
+        lock_file = open(self.path + ".lock", 'a')
+        fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        return lock_file
+
+    def changed(self):
+        """
+        Whether the save file has changed since it was last read or written.
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size) != self.stat
+
+    def read(self):
+        """
+        Read the save file, with the task store built under "store".
+        """
+        with open(self.path, 'r') as save_file:
+            stat = os.fstat(save_file.fileno())
+            data = json.load(save_file)
+        self.stat = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        data["store"] = store_from_save(data)
+        return data
+
+    def remember(self, data: dict):
+        """
+        Make the save file :param data: the base of the next merge.
+        """
+        self.version = data.get("version", 0)
+        settings = {key: data.get(key) for key in ("secrets-password-hash", "logs-status")}
+        attributes = {key: dict(data.get(key, {})) for key in TASK_ATTRIBUTES}
+        self.base = (dict(data["store"]), settings, attributes)
+
+    def load(self):
+        """
+        Read the save file and remember it as the base of the next merge.
+        """
+        with self.locked(False):
+            data = self.read()
+        self.remember(data)
+        return data
+
+    def merge(self, manager, data: dict):
+        """
+        Merge the save file :param data: written by other sessions into the
+        session of :param manager:, which keeps its own changes, then make
+        it the base of the next merge.
+        """
+        base, base_settings, base_attributes = self.base
+        ours = manager.store
+        theirs = data["store"]
+        picked = sum(1 for task, flags in theirs.items() if base.get(task) != flags)
+        picked += sum(1 for task in base if task not in theirs)
+        changed = [task for task, flags in ours.items() if base.get(task) != flags]
+        changed.extend(task for task in base if task not in ours)
+        merged = dict(theirs)
+        conflicts = 0
+        for task in changed:
+            mine = ours.get(task)
+            other = theirs.get(task)
+            if other != base.get(task) and other != mine:
+                conflicts += 1
+            if mine is None:
+                merged.pop(task, None)
+            elif other is not None and other & ~Status.COMPLETE == mine & ~Status.COMPLETE:
+                merged[task] = mine
+            else:
+                # The task has changed of list: it goes at the end of the new one
+                merged.pop(task, None)
+                merged[task] = mine
+        settings = manager.settings()
+        # The counters are counted again from the merged tasks
+        result = {"store": merged}
+        for key, value in base_settings.items():
+            result[key] = settings[key] if settings[key] != value else data.get(key)
+        for key, base_list in base_attributes.items():
+            ours_list = manager.attribute(key)
+            merged_list = dict(data.get(key, {}))
+            for task in ours_list.keys() | base_list.keys():
+                if ours_list.get(task) != base_list.get(task):
+                    if task in ours_list:
+                        merged_list[task] = ours_list[task]
+                    else:
+                        merged_list.pop(task, None)
+            result[key] = merged_list
+        manager.apply(result)
+        self.remember(data)
+        self.merged = (picked, conflicts)
+
+    def prepare(self, manager):
+        """
+        Write the session of :param manager: under an exclusive lock, after
+        merging the changes of the other sessions if the save file has
+        changed. Everything is done here, while the session is locked.
+        """
+        with self.locked(True):
+            self.merged = (0, 0)
+            if self.changed():
+                data = self.read()
+                if data.get("version", 0) != self.version:
+                    self.merge(manager, data)
+            data = {"version": self.version + 1}
+            data.update(manager.snapshot())
+            size = write_atomic(self.path, data)
+            stat = os.stat(self.path)
+            self.stat = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        data["store"] = manager.store
+        self.remember(data)
+        return lambda: size
+
+    def refresh(self, manager):
+        """
+        Merge the changes saved by other sessions since the last load, save
+        or refresh into the session of :param manager:. Only the state of
+        the save file is checked if it hasn't changed.
+        Return the amount of changes picked up and of conflicts.
+        """
+        with self.locked(False):
+            if not self.changed():
+                return (0, 0)
+            data = self.read()
+        if data.get("version", 0) == self.version:
+            return (0, 0)
+        self.merge(manager, data)
+        return self.merged
+
+STORAGES = {
+    "json": JSONStorage,
+    "journal": JournalStorage,
+    "sqlite": SQLiteStorage,
+    "binary": BinaryStorage,
+    "shared": SharedStorage,
+}
+
+def words(text: str):
+    """
+    Return the lowercase words of :param text:.
+    """
+    return re.findall(r"\w+", text.lower())
+
+class WordIndex:
+    """
+    Inverted index of the task names: each word maps to the set of tasks
+    whose name contains it, so a search only goes through the tasks having
+    its rarest word. When many tasks match, they are taken in the order of
+    the ranked tasks of that word, so only the first ones are looked at.
+    :param postings: the tasks of each word
+    :param ranked: the ranks (see rank) of the tasks of the words searched
+    which have at least RANKED_SIZE tasks, sorted, built when they are
+    first searched and then kept up to date
+    """
+    RANKED_SIZE = 256
+
+    def __init__(self, tasks=()):
+        self.postings = {}
+        self.ranked = {}
+        for task in tasks:
+            self.add(task)
+
+    @staticmethod
+    def rank(task: str, task_words: list=None):
+        """
+        Return the key of a :param task: in the results: tasks whose name
+        has the least other words rank first, then the shortest ones.
+        :param task_words: the words of the task, if they are known
+        """
+        return (len(task_words if task_words is not None else words(task)), len(task), task)
+
+    def add(self, task: str):
+        """
+        Index a :param task:.
+        """
+        task_words = words(task)
+        for word in set(task_words):
+            self.postings.setdefault(word, set()).add(task)
+            ranked = self.ranked.get(word)
+            if ranked is not None:
+                bisect.insort(ranked, self.rank(task, task_words))
+
+    def discard(self, task: str):
+        """
+        Remove a :param task: from the index.
+        """
+        task_words = words(task)
+        for word in set(task_words):
+            tasks = self.postings.get(word)
+            if tasks is not None and task in tasks:
+                tasks.discard(task)
+                if not tasks:
+                    del self.postings[word]
+                ranked = self.ranked.get(word)
+                if ranked is not None:
+                    if tasks:
+                        del ranked[bisect.bisect_left(ranked, self.rank(task, task_words))]
+                    else:
+                        del self.ranked[word]
+
+    def search(self, terms: list, accept, limit: int):
+        """
+        Return the :param limit: best tasks having all the words of
+        :param terms: and accepted by :param accept: (a function called
+        with each task), by rank.
+        """
+        terms = set(word for term in terms for word in words(term))
+        postings = sorted(((self.postings.get(term, set()), term) for term in terms), key=lambda posting: len(posting[0]))
+        if not postings:
+            return []
+        tasks, rarest = postings[0]
+        # The intersection goes through the smallest set first
+        matches = tasks.intersection(*(other for other, term in postings[1:])) if len(postings) > 1 else tasks
+        if len(matches) < self.RANKED_SIZE:
+            return heapq.nsmallest(limit, filter(accept, matches), key=self.rank)
+        ranked = self.ranked.get(rarest)
+        if ranked is None:
+            ranked = self.ranked[rarest] = sorted(map(self.rank, tasks))
+        found = []
+        for count, length, task in ranked:
+            if task in matches and accept(task):
+                found.append(task)
+                if len(found) == limit:
+                    break
+        return found
+
+class TrieNode:
+    """
+    A node of a NameTrie.
+    :param children: the child of each next character, or None while the
+    node is a bucket
+    :param names: the names of a bucket, or for a node with children, the
+    name ending at this node, if any
+    """
+    __slots__ = ("children", "names")
+
+    def __init__(self):
+        self.children = None
+        self.names = set()
+
+class NameTrie:
+    """
+    Prefix trie of the task names, to complete them and to find the names
+    close to a misspelt one. It is a burst trie: the names sharing a
+    prefix are kept in a bucket until there are more than BURST_SIZE of
+    them, then the bucket becomes a node with a child per next character,
+    so the trie takes few nodes besides the names, which are shared with
+    the task store.
+    :param root: the node of the empty prefix
+    """
+    BURST_SIZE = 32
+
+    def __init__(self, names=()):
+        self.root = self.build(sorted(names))
+
+    def build(self, names: list):
+        """
+        Return the root of a trie of the sorted :param names:. The names of
+        each child are found by bisection, since they follow each other, so
+        the names aren't gone through character by character.
+        """
+        root = TrieNode()
+        stack = [(root, 0, 0, len(names))]
+        # The nodes make no reference cycle: the garbage collector would only
+        # go through them again and again while they are made
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            self.fill(names, stack)
+        finally:
+            if collecting:
+                gc.enable()
+        return root
+
+    def fill(self, names: list, stack: list):
+        """
+        Make the nodes of the :param stack: (each with its depth and the
+        range of its names) and of their children.
+        """
+        while stack:
+            node, depth, start, end = stack.pop()
+            if end - start <= self.BURST_SIZE:
+                node.names = set(names[start:end])
+                continue
+            node.children = {}
+            # The name ending at this node comes before the longer ones
+            if len(names[start]) == depth:
+                node.names.add(names[start])
+                start += 1
+            while start < end:
+                prefix = names[start][:depth + 1]
+                if ord(prefix[-1]) < sys.maxunicode:
+                    # The first name after those starting with the prefix
+                    child_end = bisect.bisect_left(names, prefix[:-1] + chr(ord(prefix[-1]) + 1), start, end)
+                else:
+                    child_end = end
+                child = node.children[prefix[-1]] = TrieNode()
+                stack.append((child, depth + 1, start, child_end))
+                start = child_end
+
+    def add(self, name: str):
+        """
+        Add a :param name: to the trie.
+        """
+        node = self.root
+        depth = 0
+        while node.children is not None:
+            if depth == len(name):
+                node.names.add(name)
+                return
+            node = node.children.setdefault(name[depth], TrieNode())
+            depth += 1
+        node.names.add(name)
+        # A bucket bursting may fill a child bucket past the size again
+        while len(node.names) > self.BURST_SIZE:
+            names = node.names
+            node.names = set()
+            node.children = {}
+            for other in names:
+                if len(other) == depth:
+                    node.names.add(other)
+                else:
+                    node.children.setdefault(other[depth], TrieNode()).names.add(other)
+            node = max(node.children.values(), key=lambda child: len(child.names))
+            depth += 1
+
+    def discard(self, name: str):
+        """
+        Remove a :param name: from the trie, if it is there.
+        """
+        node = self.root
+        for character in name:
+            if node.children is None:
+                break
+            node = node.children.get(character)
+            if node is None:
+                return
+        node.names.discard(name)
+
+    def complete(self, prefix: str, accept, limit: int, budget: int=20000):
+        """
+        Return the first :param limit: names starting with :param prefix:
+        accepted by :param accept:, in alphabetical order. At most
+        :param budget: names are looked at, so that a prefix whose names are
+        mostly rejected doesn't go through the whole trie.
+        """
+        node = self.root
+        depth = 0
+        while node.children is not None and depth < len(prefix):
+            node = node.children.get(prefix[depth])
+            if node is None:
+                return []
+            depth += 1
+        found = []
+        # Depth first, the names ending at a node coming before its children
+        stack = [node]
+        while stack and budget > 0:
+            node = stack.pop()
+            for name in sorted(node.names):
+                budget -= 1
+                if name.startswith(prefix) and accept(name):
+                    found.append(name)
+                    if len(found) == limit:
+                        return found
+            if node.children is not None:
+                stack.extend(node.children[character] for character in sorted(node.children, reverse=True))
+        return found
+
+    def closest(self, word: str, distance: int):
+        """
+        Iterate over the names at most :param distance: edits (insertions,
+        deletions and substitutions of a character) away from
+        :param word:, and their distance. The edit distance is computed one
+        row per character along the trie, and the branches whose prefix is
+        already too far from the word are skipped.
+        """
+        def step(row: list, character: str):
+            next_row = [row[0] + 1]
+            for i, letter in enumerate(word, 1):
+                next_row.append(min(next_row[i - 1] + 1, row[i] + 1, row[i - 1] + (letter != character)))
+            return next_row
+
+        stack = [(self.root, 0, list(range(len(word) + 1)))]
+        while stack:
+            node, depth, row = stack.pop()
+            if node.children is not None:
+                for name in node.names:
+                    if row[-1] <= distance:
+                        yield name, row[-1]
+                for character, child in node.children.items():
+                    next_row = step(row, character)
+                    if min(next_row) <= distance:
+                        stack.append((child, depth + 1, next_row))
+                continue
+            for name in node.names:
+                if abs(len(name) - len(word)) > distance:
+                    continue
+                name_row = row
+                for character in name[depth:]:
+                    name_row = step(name_row, character)
+                    if min(name_row) > distance:
+                        break
+                else:
+                    if name_row[-1] <= distance:
+                        yield name, name_row[-1]
+
+    def memory_size(self):
+        """
+        Return the memory taken by the nodes and their sets of names, in
+        bytes, the names themselves being counted with the task store.
+        """
+        size = 0
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            size += sys.getsizeof(node) + sys.getsizeof(node.names)
+            if node.children is not None:
+                size += sys.getsizeof(node.children)
+                stack.extend(node.children.values())
+        return size
+
+class DateIndex:
+    """
+    Heap of the tasks by date (due date or reminder), so that the first k
+    tasks are found in O(k log n) without sorting them all. It is updated
+    lazily: the entries whose task has another date or is put aside
+    (complete, removed or hidden) are dropped once they reach the top, and
+    the tasks which are scheduled again are pushed again.
+    :param dates: the date of each task, as time stamps
+    :param scheduled: tells whether a task isn't put aside
+    :param heap: the (date, task) entries
+    """
+    def __init__(self, dates: dict, scheduled):
+        self.dates = dates
+        self.scheduled = scheduled
+        self.rebuild()
+
+    def rebuild(self):
+        """
+        Build the heap from the dates, without the stale entries.
+        """
+        self.heap = [(stamp, task) for task, stamp in self.dates.items() if self.scheduled(task)]
+        heapq.heapify(self.heap)
+
+    def push(self, task: str):
+        """
+        Add the date of a :param task:, which has changed or is scheduled
+        again.
+        """
+        heapq.heappush(self.heap, (self.dates[task], task))
+        if len(self.heap) > 2 * len(self.dates) + 64:
+            self.rebuild()
+
+    def first(self, limit: int=None, before: int=None):
+        """
+        Return the first tasks and their date, in date order.
+        :param limit: the amount of tasks, all of them if None
+        :param before: only the dates up to this time stamp if given
+        """
+        heap = self.heap
+        found = []
+        seen = set()
+        while heap and (limit is None or len(found) < limit):
+            stamp, task = heap[0]
+            if before is not None and stamp > before:
+                break
+            heapq.heappop(heap)
+            if task not in seen and self.dates.get(task) == stamp and self.scheduled(task):
+                seen.add(task)
+                found.append((stamp, task))
+        for entry in found:
+            heapq.heappush(heap, entry)
+        return [(task, stamp) for stamp, task in found]
+
+class CommandHistory:
+    """
+    The commands history: the last commands are kept in a ring of bounded
+    size, and the older ones are spilled to an append-only history file,
+    which is only read when they are displayed or searched.
+    :param path: the history file, or None to only keep the last commands
+    :param size: how many commands are kept in memory
+    :param ring: the last commands
+    :param stored: how many commands are in the history file
+    :param pending: the commands not written to the history file yet
+    :param cleared: whether the history file is emptied at the next flush
+    :param error: the message of the failed write of the history file,
+    until the file is written again; the commands are kept in pending
+    meanwhile
+    :param reported: whether the error has been reported (see new_error)
+    """
+    def __init__(self, path=None, size: int=HISTORY_SIZE):
+        self.path = path
+        self.size = size
+        self.ring = collections.deque(maxlen=size)
+        self.stored = 0
+        self.pending = []
+        self.cleared = False
+        self.error = None
+        self.reported = False
+
+    def __len__(self):
+        if self.path is None:
+            return len(self.ring)
+        return self.stored + len(self.pending)
+
+    def __iter__(self):
+        """
+        Iterate over all the commands, oldest first. The commands which are
+        not in the ring anymore are read from the history file as a stream,
+        or from the pending commands if they couldn't be written.
+        """
+        older = len(self) - len(self.ring)
+        if older > 0 and self.stored:
+            with open(self.path, 'r', encoding="utf-8") as file:
+                for line in itertools.islice(file, min(older, self.stored)):
+                    yield line.rstrip("\n")
+        yield from self.pending[:max(0, older - self.stored)]
+        yield from self.ring
+
+    def append(self, command: str):
+        """
+        Add a :param command: to the history.
+        """
+        self.ring.append(command)
+        if self.path is None:
+            return
+        self.pending.append(command)
+        # The commands leaving the ring must be in the history file
+        if len(self.pending) >= self.size:
+            try:
+                self.flush()
+            except OSError as error:
+                if self.error is None:
+                    self.error = f"The history file can't be written: {error.strerror or error}."
+                    self.reported = False
+
+    def new_error(self):
+        """
+        Return the message of the failed write of the history file the
+        first time it is asked for, None otherwise.
+        """
+        if self.error is None or self.reported:
+            return None
+        self.reported = True
+        return self.error
+
+    def clear(self):
+        """
+        Clear the entire history, the history file at the next flush.
+        """
+        self.ring.clear()
+        self.pending = []
+        self.stored = 0
+        self.cleared = True
+
+    def search(self, text: str):
+        """
+        Iterate over the commands containing :param text: (ignoring the
+        case) and their position in the history.
+        """
+        text = text.lower()
+        return ((i, command) for i, command in enumerate(self, start=1) if text in command.lower())
+
+    def flush(self):
+        """
+        Append the pending commands to the history file.
+        """
+        if self.path is None or not (self.pending or self.cleared):
+            return
+        with open(self.path, 'w' if self.cleared else 'a', encoding="utf-8") as file:
+            file.writelines(command + "\n" for command in self.pending)
+        self.stored += len(self.pending)
+        self.pending = []
+        self.cleared = False
+        self.error = None
+
+    def load(self, legacy=None):
+        """
+        Read the last commands of the history file, without keeping the
+        older ones in memory. If there is no history file yet, the
+        :param legacy: history of an older save file is used instead, and
+        written at the next flush.
+        """
+        self.ring.clear()
+        self.pending = []
+        self.stored = 0
+        self.cleared = False
+        self.error = None
+        if self.path is None or not os.path.exists(self.path):
+            for command in legacy or ():
+                self.append(command)
+            return
+        with open(self.path, 'r', encoding="utf-8") as file:
+            tail = collections.deque(enumerate(file, start=1), maxlen=self.size)
+        self.stored = tail[-1][0] if tail else 0
+        self.ring.extend(line.rstrip("\n") for i, line in tail)
+
+class PanCakeError(Exception):
+    """
+    Error raised by the task manager when a command cannot be done.
+    Its message is displayed to the user.
+    """
+
+class WrongPassword(PanCakeError):
+    """
+    Error raised when the password of the secret tasks is wrong.
+    """
+    def __init__(self, message: str="Wrong password."):
+        super().__init__(message)
+
+class PasswordRequired(PanCakeError):
+    """
+    Error raised when a command on a secret task is done without password.
+    """
+    def __init__(self, message: str="This task is secret, a password is required."):
+        super().__init__(message)
+
+class SaveNotFound(PanCakeError):
+    """
+    Error raised when loading a session which has never been saved.
+    """
+    def __init__(self, message: str="No saved tasks found."):
+        super().__init__(message)
+
+class UndoGroup(dict):
+    """
+    A group of the undo log: it maps the tasks it has changed to their
+    previous flags (None for a task which didn't exist).
+    :param attributes: the due date, the reminder and the tags (by their
+    key in TASK_ATTRIBUTES) the tasks have lost, as they were
+    """
+    def __init__(self):
+        super().__init__()
+        self.attributes = {}
+
+def undoable(method):
+    """
+    Make the changes made to the task store by a TaskManager
+    :param method: one group of the undo log. The changes made by the
+    methods it calls belong to the same group.
+    """
+    @functools.wraps(method)
+    def record_group(self, *args, **kwargs):
+        if self.undo_group is not None:
+            return method(self, *args, **kwargs)
+        self.undo_group = UndoGroup()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            group, self.undo_group = self.undo_group, None
+            if group:
+                self.undo_log.append(group)
+                self.redo_log.clear()
+    return record_group
+
+class TaskManager:
+    """
+    The PanCake task engine: it never reads input nor prints anything.
+    Commands return their result, and raise a PanCakeError when they cannot
+    be done.
+    :param store: the task store, mapping each task to its status and flags
+    (pinned, secret, trashed); the user tasks, the important tasks, the
+    secret tasks and the trash are views over it
+    :param counts: the amount of tasks of the store by status and flags
+    (indexed by their combination), kept up to date by put_task, move_task
+    and delete_task, through which every change of the store goes; the
+    counters of the lists and of the completed and unfinished tasks are
+    read from it
+    :param sealed_counts: the amount of unfinished and completed secret
+    tasks while the secrets file hasn't been read, as saved
+    :param undo_log: the last groups of changes made to the task store
+    (see UndoGroup)
+    :param redo_log: the groups of changes undone, to be redone
+    :param undo_group: the group of the changes being made, if any
+    :param dates: the due dates and the reminders of the tasks (by their
+    name in DATE_LISTS), as time stamps
+    :param date_indexes: the DateIndex of each of them, built when they
+    are first used and then kept up to date
+    :param timer: the ReminderTimer told about the new reminders, if any
+    :param tags: the tags of each tagged task
+    :param tag_index: the tasks of each tag, in the order they were tagged
+    :param tag_counts: the amount of tasks of each tag by status and
+    flags, kept up to date like counts
+    :param history: the commands history, the older commands being in the
+    history file (the save file followed by .history)
+    :param save_file: the PanCake save file
+    :param password_hash: the hash of the password of the secret tasks
+    (None when there is no password)
+    :param unlocked_until: the time.monotonic() until which the secret
+    tasks can be used without the password
+    :param secrets_file: the file of the secret tasks (the save file
+    followed by .secrets), which is only read once they are used
+    :param sealed: whether the secrets file hasn't been read yet
+    :param sealed_names: keyed digests (see name_digest) of the names of
+    the secrets file while it is sealed, read when a name is first looked
+    for, so that a name can be checked without the password
+    :param secrets_changed: whether the secret tasks have changed since
+    the secrets file was written
+    :param legacy_secrets: whether the save file still has secret tasks,
+    as written by older versions
+    :param logs_status: the logs status (2 by default), saved with the tasks
+    :param storage: the name of the storage used for the save file ("json", "journal" or "sqlite")
+    :param word_index: the index of the task names used by search, built on
+    the first search and then kept up to date
+    :param name_trie: the NameTrie of the task names used by the completion
+    and the fuzzy resolver, built when first used and then kept up to
+    date; it holds the names of every list, which are told apart by their
+    flags in the store, so it doesn't change when a task changes of list
+    :param changes: how many changes have been made to the session
+    :param saved_changes: the value of changes when the session was last
+    saved or loaded; the session is dirty when they differ
+    :param lock: held while the session is changed, and while a save takes
+    what it writes
+    :param saving: held during a whole save, so that saves don't overlap
+    :param autosave: the Autosave told about the changes, if any
+    :param last_save: the duration (in seconds) and the amount of bytes
+    written of the last save, if any
+    :param last_load: the duration of the last load, in seconds, if any
+    :param measured: the value of changes and the memory_size of the
+    session when it was last estimated, if it has been
+    """
+    def __init__(self, save_file=None, storage: str="json", history_size: int=HISTORY_SIZE):
+        self.store = {}
+        self.word_index = None
+        self.name_trie = None
+        self.counts = [0] * FLAG_COMBINATIONS
+        self.sealed_counts = [0, 0]
+        self.undo_log = collections.deque(maxlen=UNDO_SIZE)
+        self.redo_log = collections.deque(maxlen=UNDO_SIZE)
+        self.undo_group = None
+        self.dates = {key: {} for key in DATE_LISTS}
+        self.date_indexes = dict.fromkeys(DATE_LISTS)
+        self.timer = None
+        self.tags = {}
+        self.tag_index = {}
+        self.tag_counts = {}
+        self.password_hash = None
+        self.unlocked_until = 0.0
+        self.logs_status = 2
+
+        self.save_file = default_save_file() if save_file is None else save_file
+        self.secrets_file = self.save_file + ".secrets"
+        self.sealed = False
+        self.sealed_names = None
+        # Random for each session, so the digests of the names can't be
+        # compared with a list of digests made beforehand
+        self.digest_key = os.urandom(16)
+        self.secrets_changed = False
+        self.legacy_secrets = False
+        self.storage = STORAGES[storage](self.save_file)
+        self.history = CommandHistory(self.save_file + ".history", history_size)
+        self.changes = 0
+        self.saved_changes = 0
+        self.lock = threading.RLock()
+        self.saving = threading.Lock()
+        self.autosave = None
+        self.last_save = None
+        self.last_load = None
+        self.measured = None
+
+    def __repr__(self):
+        return f"TaskManager(tasks={dict(self.view('tasks'))}, complete={self.complete}, unfinished={self.unfinished}, trash={dict(self.view('trash'))})"
+
+    def view(self, key: str, status: Status=None, tag: str=None):
+        """
+        Iterate over the tasks of a list (by its name in the save file) and
+        their status names, in order.
+        :param status: only the tasks with this status if given
+        :param tag: only the tasks with this tag if given, in the order
+        they were tagged (going through the tasks of the tag only)
+        """
+        mask, value = VIEWS[key]
+        if status is not None:
+            mask, value = mask | Status.COMPLETE, value | status
+        store = self.store
+        items = store.items() if tag is None else ((task, store[task]) for task in self.tag_index.get(tag, ()))
+        for task, flags in items:
+            if flags & mask == value:
+                yield task, STATUS_NAMES[flags & Status.COMPLETE]
+
+    def check_password(self, password: str):
+        """
+        Raise a WrongPassword error if :param password: isn't the password
+        of the secret tasks.
+        """
+        if self.password_hash is None:
+            if password != "":
+                raise WrongPassword()
+        elif not verify_password(password, self.password_hash):
+            raise WrongPassword()
+
+    def unlocked(self):
+        """
+        Whether the secret tasks can be used without the password.
+        """
+        return time.monotonic() < self.unlocked_until
+
+    def unlock(self, password: str, timeout: float=UNLOCK_TIMEOUT):
+        """
+        Check :param password: once, and let the secret tasks be used
+        without it for :param timeout: seconds.
+        """
+        self.check_password(password)
+        self.unlocked_until = time.monotonic() + timeout
+        self.unseal()
+
+    def lock_secrets(self):
+        """
+        Require the password again to use the secret tasks.
+        """
+        self.unlocked_until = 0.0
+
+    def authorize(self, password: str):
+        """
+        Let the secret tasks be used if they are unlocked or if
+        :param password: is right (a PasswordRequired error is raised if it
+        is None), reading them if they haven't been read yet.
+        """
+        if not self.unlocked():
+            if password is None:
+                raise PasswordRequired()
+            self.check_password(password)
+        self.unseal()
+
+    def unseal(self):
+        """
+        Read the secret tasks from the secrets file, if it hasn't been read
+        yet. The tasks of the file replace the secret tasks left in the save
+        file by older versions.
+        """
+        if not self.sealed:
+            return
+        secrets = self.read_secrets()
+        self.sealed = False
+        self.sealed_names = None
+        self.sealed_counts = [0, 0]
+        # Reading the secret tasks isn't a change to undo
+        group, self.undo_group = self.undo_group, None
+        for task, status in secrets.items():
+            flags = self.store.get(task)
+            if flags is None:
+                self.index_task(task)
+            elif flags & (SECRET | TRASHED) != SECRET:
+                continue
+            self.put_task(task, SECRET | (Status.COMPLETE if status == "Complete" else Status.UNFINISHED))
+        self.undo_group = group
+
+    def read_secrets(self):
+        """
+        Return the secret tasks of the secrets file and their status.
+        """
+        try:
+            with open(self.secrets_file, "r", encoding="utf-8") as file:
+                return json.load(file)["secrets"]
+        except FileNotFoundError:
+            return {}
+        except (ValueError, KeyError):
+            raise PanCakeError("Error loading the secret tasks. File may be corrupted.")
+
+    def name_digest(self, task: str):
+        """
+        Return the digest of a :param task: name, keyed for this session.
+        """
+        # Imported here so that PanCake starts faster when it isn't used
+        import hmac
+
+        return hmac.digest(self.digest_key, task.encode("utf-8"), "sha256")
+
+    def sealed_secret(self, task: str):
+        """
+        Whether :param task: is the name of a secret task which hasn't been
+        read. The secret tasks stay sealed: only the digests of their names
+        are kept.
+        """
+        if not self.sealed:
+            return False
+        if self.sealed_names is None:
+            self.sealed_names = {self.name_digest(name) for name in self.read_secrets()}
+        return self.name_digest(task) in self.sealed_names
+
+    def secret_tasks(self, password: str, status: Status=None):
+        """
+        Return an iterator over the secret tasks and their status.
+        """
+        self.authorize(password)
+        return self.view("secrets", status)
+
+    def index_task(self, task: str):
+        """
+        Add a new :param task: to the word index and the name trie, if
+        they are built.
+        """
+        if self.word_index is not None:
+            self.word_index.add(task)
+        if self.name_trie is not None:
+            self.name_trie.add(task)
+
+    def unindex_task(self, task: str):
+        """
+        Remove a destroyed :param task: from the word index and the name
+        trie, if they are built.
+        """
+        if self.word_index is not None:
+            self.word_index.discard(task)
+        if self.name_trie is not None:
+            self.name_trie.discard(task)
+
+    def search(self, terms: list, password: str=None, limit: int=20, secrets: bool=False):
+        """
+        Return the best tasks (and their status and list) matching the words
+        of :param terms:, from the user tasks, the important tasks and the
+        trash. The secret tasks are included if :param secrets: is True,
+        which requires :param password: unless they are unlocked.
+        """
+        if secrets:
+            self.authorize(password)
+        if self.word_index is None:
+            self.word_index = WordIndex(self.store)
+        hidden = 0 if secrets else SECRET
+        store = self.store
+
+        def accept(task: str):
+            return not store[task] & hidden
+
+        results = []
+        for task in self.word_index.search(terms, accept, limit):
+            flags = store[task]
+            key = "trash" if flags & TRASHED else origin(flags)
+            results.append((task, STATUS_NAMES[flags & Status.COMPLETE], key))
+        return results
+
+    def name_filter(self, key: str):
+        """
+        Return a function telling whether a task name belongs to the list
+        :param key: ("tasks" for every task out of the trash, "trash" or
+        "secrets"), or None if the list can't be used. The secret tasks
+        are only given while they are unlocked, so that their names can't
+        be found without the password.
+        """
+        store = self.store
+        if key == "trash":
+            return lambda task: store.get(task, 0) & TRASHED
+        secrets = self.unlocked()
+        if key == "secrets":
+            if not secrets:
+                return None
+            return lambda task: store.get(task, 0) & (SECRET | TRASHED) == SECRET
+        hidden = TRASHED if secrets else TRASHED | SECRET
+        return lambda task: task in store and not store[task] & hidden
+
+    def names(self):
+        """
+        Return the NameTrie of the task names, building it if needed.
+        """
+        if self.name_trie is None:
+            self.name_trie = NameTrie(self.store)
+        return self.name_trie
+
+    def complete_name(self, prefix: str, key: str="tasks", limit: int=COMPLETION_LIMIT):
+        """
+        Return the first names (in alphabetical order) of the tasks of the
+        list :param key: (see name_filter) starting with :param prefix:.
+        """
+        accept = self.name_filter(key)
+        if accept is None:
+            return []
+        return self.names().complete(prefix, accept, limit)
+
+    def closest_task(self, name: str, key: str="tasks", distance: int=FUZZY_DISTANCE):
+        """
+        Return the name of the task of the list :param key: (see
+        name_filter) the closest to :param name:, at most
+        :param distance: edits away, or None if there is none. Between
+        tasks as close, the shortest name is taken, then the first one in
+        alphabetical order.
+        """
+        accept = self.name_filter(key)
+        if accept is None:
+            return None
+        found = ((edits, len(task), task) for task, edits in self.names().closest(name, distance) if accept(task))
+        closest = min(found, default=None)
+        return closest[2] if closest is not None else None
+
+    def put_task(self, task: str, flags: int):
+        """
+        Give :param flags: to a :param task:, which is added at the end of
+        the store if it is new.
+        """
+        previous = self.store.get(task)
+        if self.undo_group is not None:
+            self.undo_group.setdefault(task, previous)
+        if previous is not None:
+            self.counts[previous] -= 1
+        self.store[task] = flags
+        self.counts[flags] += 1
+        if task in self.tags:
+            self.count_tags(task, previous, flags)
+        if not flags & UNSCHEDULED and (previous is None or previous & UNSCHEDULED):
+            self.schedule(task)
+
+    def move_task(self, task: str, flags: int):
+        """
+        Give new :param flags: to a :param task: which changes of list,
+        putting it at the end of its new list.
+        """
+        previous = self.store.pop(task)
+        if self.undo_group is not None:
+            self.undo_group.setdefault(task, previous)
+        self.counts[previous] -= 1
+        self.store[task] = flags
+        self.counts[flags] += 1
+        if task in self.tags:
+            self.count_tags(task, previous, flags)
+        if not flags & UNSCHEDULED and previous & UNSCHEDULED:
+            self.schedule(task)
+
+    def delete_task(self, task: str):
+        """
+        Remove a :param task: from the store.
+        """
+        previous = self.store.pop(task)
+        if self.undo_group is not None:
+            self.undo_group.setdefault(task, previous)
+        self.counts[previous] -= 1
+        self.unindex_task(task)
+        if task in self.tags:
+            self.count_tags(task, previous, None)
+        self.drop_attributes(task)
+
+    def scheduled(self, task: str):
+        """
+        Whether a :param task: exists and isn't complete, removed nor
+        hidden, so its due date and reminder are taken into account.
+        """
+        flags = self.store.get(task)
+        return flags is not None and not flags & UNSCHEDULED
+
+    def schedule(self, task: str):
+        """
+        Push the dates of a :param task: which is scheduled again in the
+        date indexes.
+        """
+        for key, index in self.date_indexes.items():
+            if index is not None and task in self.dates[key]:
+                index.push(task)
+
+    def drop_attributes(self, task: str):
+        """
+        Forget the due date, the reminder and the tags of a :param task:,
+        keeping them in the undo group to give them back.
+        """
+        dropped = {}
+        for key in DATE_LISTS:
+            stamp = self.dates[key].pop(task, None)
+            if stamp is not None:
+                dropped[key] = stamp
+                self.record("pop", key, task)
+        if task in self.tags:
+            dropped["tags"] = self.tags[task][:]
+            for tag in dropped["tags"]:
+                self.remove_tag(task, tag)
+        if dropped and self.undo_group is not None:
+            self.undo_group.attributes.setdefault(task, dropped)
+
+    def restore_attributes(self, task: str, attributes: dict):
+        """
+        Give back to a :param task: the :param attributes: it has lost (see
+        drop_attributes).
+        """
+        for key in DATE_LISTS:
+            if key in attributes:
+                self.put_date(key, task, attributes[key])
+        for tag in attributes.get("tags", ()):
+            if tag not in self.tags.get(task, ()):
+                self.add_tag(task, tag)
+
+    def attribute(self, key: str):
+        """
+        Return the dates or the tags (:param key: in TASK_ATTRIBUTES) of
+        the tasks.
+        """
+        return self.tags if key == "tags" else self.dates[key]
+
+    def count_tags(self, task: str, previous: int, flags: int):
+        """
+        Update the counters of the tags of a :param task: whose flags have
+        changed from :param previous: to :param flags: (None when the task
+        doesn't exist).
+        """
+        for tag in self.tags[task]:
+            counts = self.tag_counts[tag]
+            if previous is not None:
+                counts[previous] -= 1
+            if flags is not None:
+                counts[flags] += 1
+
+    def index_tags(self):
+        """
+        Build the tasks and the counters of each tag from the tags of the
+        tasks.
+        """
+        self.tag_index = {}
+        self.tag_counts = {}
+        for task, tags in self.tags.items():
+            flags = self.store.get(task)
+            for tag in tags:
+                self.tag_index.setdefault(tag, {})[task] = None
+                counts = self.tag_counts.setdefault(tag, [0] * FLAG_COMBINATIONS)
+                if flags is not None:
+                    counts[flags] += 1
+
+    def tag_task(self, task: str, tag: str):
+        """
+        Give a :param tag: to a user or important :param task:.
+        """
+        flags = self.store.get(task)
+        if flags is None or flags & SECRET:
+            raise PanCakeError("This task doesn't exist.")
+        if flags & TRASHED:
+            raise PanCakeError("This task is in the trash.")
+        if not tag or any(character.isspace() for character in tag):
+            raise PanCakeError("Invalid tag.")
+        if tag in self.tags.get(task, ()):
+            raise PanCakeError("This task already has this tag.")
+        self.add_tag(task, tag)
+
+    def add_tag(self, task: str, tag: str):
+        """
+        Give a :param tag: the :param task: doesn't have yet.
+        """
+        tags = self.tags.setdefault(task, [])
+        tags.append(tag)
+        self.tag_index.setdefault(tag, {})[task] = None
+        self.tag_counts.setdefault(tag, [0] * FLAG_COMBINATIONS)[self.store[task]] += 1
+        self.record("set", "tags", task, list(tags))
+
+    def untag_task(self, task: str, tag: str):
+        """
+        Remove a :param tag: from a :param task:.
+        """
+        if tag not in self.tags.get(task, ()):
+            raise PanCakeError("This task doesn't have this tag.")
+        self.remove_tag(task, tag)
+
+    def remove_tag(self, task: str, tag: str):
+        """
+        Remove a :param tag: the :param task: has.
+        """
+        tags = self.tags[task]
+        tags.remove(tag)
+        flags = self.store.get(task)
+        if flags is not None:
+            self.tag_counts[tag][flags] -= 1
+        del self.tag_index[tag][task]
+        if not self.tag_index[tag]:
+            del self.tag_index[tag]
+            del self.tag_counts[tag]
+        if tags:
+            self.record("set", "tags", task, list(tags))
+        else:
+            del self.tags[task]
+            self.record("pop", "tags", task)
+
+    def tag_sizes(self):
+        """
+        Return the amount of completed and unfinished tasks of each tag,
+        out of the trash, from the counters.
+        """
+        return {tag: self.advancement(tag) for tag in sorted(self.tag_index)}
+
+    def date_index(self, key: str):
+        """
+        Return the DateIndex of the dates :param key: ("due" or
+        "reminders"), building it if needed.
+        """
+        index = self.date_indexes[key]
+        if index is None:
+            index = self.date_indexes[key] = DateIndex(self.dates[key], self.scheduled)
+        return index
+
+    def set_date(self, key: str, task: str, stamp: int=None):
+        """
+        Give a due date or a reminder (:param key: "due" or "reminders") to
+        a user or important :param task:, or remove it if :param stamp: is
+        None.
+        """
+        flags = self.store.get(task)
+        if flags is None or flags & SECRET:
+            raise PanCakeError("This task doesn't exist.")
+        if flags & TRASHED:
+            raise PanCakeError("This task is in the trash.")
+        dates = self.dates[key]
+        if stamp is None:
+            if dates.pop(task, None) is None:
+                raise PanCakeError("This task has no due date." if key == "due" else "This task has no reminder.")
+            self.record("pop", key, task)
+            return
+        self.put_date(key, task, stamp)
+
+    def put_date(self, key: str, task: str, stamp: int):
+        """
+        Give a due date or a reminder (:param key:) to a :param task:,
+        pushing it in the date index and telling the reminder timer.
+        """
+        self.dates[key][task] = stamp
+        self.record("set", key, task, stamp)
+        if self.date_indexes[key] is not None and self.scheduled(task):
+            self.date_indexes[key].push(task)
+        if key == "reminders" and self.timer is not None:
+            self.timer.changed()
+
+    def dated_tasks(self, key: str, limit: int=None, before: int=None):
+        """
+        Return the unfinished tasks with a due date or a reminder
+        (:param key: "due" or "reminders") and their date, soonest first.
+        :param limit: the amount of tasks, all of them if None
+        :param before: only the dates up to this time stamp if given
+        """
+        return self.date_index(key).first(limit, before)
+
+    def pop_reminders(self, now: float):
+        """
+        Remove the reminders whose time has come.
+        Return their tasks and their time.
+        """
+        fired = self.dated_tasks("reminders", before=now)
+        for task, stamp in fired:
+            del self.dates["reminders"][task]
+            self.record("pop", "reminders", task)
+        return fired
+
+    def recount(self, counts: list=None):
+        """
+        Count the tasks of the store by status and flags again, or take
+        :param counts: if they have been counted while the store was read.
+        """
+        if counts is None:
+            counts = [0] * FLAG_COMBINATIONS
+            for flags, amount in collections.Counter(self.store.values()).items():
+                counts[flags] = amount
+        self.counts = list(counts)
+
+    def breakdown(self, tag: str=None):
+        """
+        Return the amount of completed and unfinished tasks of each list.
+        :param tag: only the tasks with this tag if given
+        """
+        counts = self.counts if tag is None else self.tag_counts.get(tag, [0] * FLAG_COMBINATIONS)
+        breakdown = {}
+        for key, (mask, value) in VIEWS.items():
+            complete = unfinished = 0
+            for flags, amount in enumerate(counts):
+                if flags & mask == value:
+                    if flags & Status.COMPLETE:
+                        complete += amount
+                    else:
+                        unfinished += amount
+            breakdown[key] = (complete, unfinished)
+        if tag is None:
+            complete, unfinished = breakdown["secrets"]
+            breakdown["secrets"] = (complete + self.sealed_counts[1], unfinished + self.sealed_counts[0])
+        return breakdown
+
+    @property
+    def complete(self):
+        """
+        The amount of completed tasks, out of the trash.
+        """
+        return sum(amount for flags, amount in enumerate(self.counts) if flags & (Status.COMPLETE | TRASHED) == Status.COMPLETE) + self.sealed_counts[1]
+
+    @property
+    def unfinished(self):
+        """
+        The amount of unfinished tasks, out of the trash.
+        """
+        return sum(amount for flags, amount in enumerate(self.counts) if not flags & (Status.COMPLETE | TRASHED)) + self.sealed_counts[0]
+
+    def verify(self):
+        """
+        Count all the tasks again (reading the secrets file if needed),
+        and repair the counters if they have drifted.
+        Return the drift of the completed and unfinished tasks of each list
+        (and each tag, as "#tag") which had drifted, and the duration of
+        the check in seconds.
+        """
+        start_time = time.perf_counter()
+        self.unseal()
+        kept = self.breakdown()
+        kept_tags = {tag: self.advancement(tag) for tag in self.tag_index}
+        self.recount()
+        self.index_tags()
+        counted = self.breakdown()
+        drift = {
+            key: (kept[key][0] - counted[key][0], kept[key][1] - counted[key][1])
+            for key in VIEWS if kept[key] != counted[key]
+        }
+        for tag in kept_tags.keys() | self.tag_index.keys():
+            complete, unfinished = kept_tags.get(tag, (0, 0))
+            counted_complete, counted_unfinished = self.advancement(tag)
+            if (complete, unfinished) != (counted_complete, counted_unfinished):
+                drift["#" + tag] = (complete - counted_complete, unfinished - counted_unfinished)
+        if drift:
+            # The saved counters are repaired at the next save
+            self.mark_dirty()
+        return drift, time.perf_counter() - start_time
+
+    @undoable
+    def add_task(self, task: str, password: str=None):
+        """
+        Add a new task to the user tasks.
+        A name taken by a secret task requires the password (unless the
+        secret tasks are unlocked) to be told apart from a new one.
+        """
+        flags = self.store.get(task)
+        if flags is None and self.sealed_secret(task):
+            self.authorize(password)
+            flags = self.store.get(task)
+        if flags is None:
+            self.put_task(task, Status.UNFINISHED)
+            self.index_task(task)
+            self.record("set", "tasks", task, "Unfinished")
+        elif flags & TRASHED:
+            raise PanCakeError("This task is in the trash.")
+        else:
+            if flags & SECRET:
+                self.authorize(password)
+            raise PanCakeError("Task already added.")
+
+    @undoable
+    def add_secret(self, task: str, password: str):
+        """
+        Add a new or an existing task to the secret tasks.
+        """
+        self.authorize(password)
+        flags = self.store.get(task)
+        if flags is None:
+            self.put_task(task, Status.UNFINISHED | SECRET)
+            self.index_task(task)
+            self.record("set", "secrets", task, "Unfinished")
+        elif flags & TRASHED:
+            raise PanCakeError("This task is in the trash.")
+        elif flags & SECRET:
+            raise PanCakeError("This task is already hidden.")
+        else:
+            self.move_task(task, flags & ~PINNED | SECRET)
+            self.record("set", "secrets", task, STATUS_NAMES[flags & Status.COMPLETE])
+            self.record("pop", origin(flags), task)
+            # The dates and tags are saved with the other tasks, where the
+            # secret tasks can't be
+            self.drop_attributes(task)
+
+    @undoable
+    def remove_secret(self, task: str, password: str):
+        """
+        Remove a task from the secret tasks.
+        """
+        self.authorize(password)
+        flags = self.store.get(task)
+        if flags is None or flags & (SECRET | TRASHED) != SECRET:
+            raise PanCakeError("This task is not hidden.")
+        self.move_task(task, flags & ~SECRET)
+        self.record("set", "tasks", task, STATUS_NAMES[flags & Status.COMPLETE])
+        self.record("pop", "secrets", task)
+
+    @undoable
+    def remove_task(self, task: str):
+        """
+        Move a task to the trash.
+        """
+        flags = self.store.get(task)
+        if flags is None or flags & (SECRET | TRASHED):
+            raise PanCakeError("This task doesn't exist.")
+        self.remove_tasks([task])
+
+    @undoable
+    def remove_tasks(self, tasks: list):
+        """
+        Put removed :param tasks: (not in the trash) at the end of the
+        trash. They keep their status and the flags of the list they come
+        from, so they can be recovered as they were.
+        """
+        for task in tasks:
+            flags = self.store[task]
+            self.move_task(task, flags | TRASHED)
+            status = STATUS_NAMES[flags & Status.COMPLETE]
+            self.record("pop", origin(flags), task)
+            self.record("trash-set", task, {"status": status, "origin": origin(flags)})
+
+    @undoable
+    def remove_all(self):
+        """
+        Move all the tasks to the trash.
+        Return the removed tasks.
+        """
+        removed = [task for task, status in self.view("tasks")]
+        self.remove_tasks(removed)
+        return removed
+
+    def match_tasks(self, pattern: str, kind: str="glob", keys=("tasks", "important")):
+        """
+        Return the tasks of the lists :param keys: whose name matches
+        :param pattern:.
+        :param kind: "glob" (deploy-*), "regex" (searched anywhere in the
+        name), "prefix", or "tag" (the tasks having the tag :param pattern:,
+        going through them only)
+        """
+        views = [VIEWS[key] for key in keys]
+        if kind == "tag":
+            store = self.store
+            return [
+                task for task in self.tag_index.get(pattern, ())
+                if any(store[task] & mask == value for mask, value in views)
+            ]
+        if kind == "glob":
+            match = re.compile(fnmatch.translate(pattern)).match
+        elif kind == "regex":
+            try:
+                match = re.compile(pattern).search
+            except re.error as error:
+                raise PanCakeError(f"Invalid regex: {error}.")
+        elif kind == "prefix":
+            match = lambda task: task.startswith(pattern)
+        else:
+            raise PanCakeError(f"Unknown pattern kind: {kind}.")
+        return [
+            task for task, flags in self.store.items()
+            if any(flags & mask == value for mask, value in views) and match(task)
+        ]
+
+    @undoable
+    def set_status(self, task: str, status: Status):
+        """
+        Change the :param status: of a :param task: which isn't in the trash.
+        Return False if the task already has this status.
+        """
+        return self.set_statuses([task], status) == 1
+
+    @undoable
+    def set_statuses(self, tasks: list, status: Status):
+        """
+        Change the :param status: of some :param tasks: which aren't in the
+        trash.
+        Return the amount of tasks which have changed.
+        """
+        changed = 0
+        name = str(status)
+        for task in tasks:
+            flags = self.store[task]
+            if flags & Status.COMPLETE != status:
+                self.put_task(task, flags & ~Status.COMPLETE | status)
+                self.record("set", origin(flags), task, name)
+                changed += 1
+        return changed
+
+    def find_task(self, task: str, password: str=None):
+        """
+        Return the flags of a :param task: which isn't in the trash.
+        A secret task requires the password, unless the secret tasks are
+        unlocked.
+        """
+        flags = self.store.get(task)
+        if flags is None and self.sealed_secret(task):
+            self.authorize(password)
+            flags = self.store.get(task)
+        if flags is None or flags & TRASHED:
+            raise PanCakeError("This task doesn't exist.")
+        if flags & SECRET:
+            self.authorize(password)
+        return flags
+
+    @undoable
+    def complete_task(self, task: str, password: str=None):
+        """
+        Complete a user task.
+        """
+        self.find_task(task, password)
+        if not self.set_status(task, Status.COMPLETE):
+            raise PanCakeError("Task already complete.")
+
+    @undoable
+    def full_complete(self):
+        """
+        Complete all the user tasks.
+        Return the tasks which have been gone through.
+        """
+        tasks = [task for key in ("tasks", "important") for task, status in self.view(key)]
+        self.set_statuses(tasks, Status.COMPLETE)
+        return tasks
+
+    @undoable
+    def unfinish_task(self, task: str, password: str=None):
+        """
+        Mark a user task as unfinished.
+        """
+        self.find_task(task, password)
+        self.set_status(task, Status.UNFINISHED)
+
+    @undoable
+    def full_unfinish(self):
+        """
+        Mark all the user tasks as unfinished.
+        Return the tasks which have been gone through.
+        """
+        tasks = [task for key in ("tasks", "important") for task, status in self.view(key)]
+        self.set_statuses(tasks, Status.UNFINISHED)
+        return tasks
+
+    @undoable
+    def recover_task(self, task: str):
+        """
+        Recover a removed task.
+        """
+        flags = self.store.get(task)
+        if flags is None:
+            raise PanCakeError("This task doesn't exist.")
+        if not flags & TRASHED:
+            raise PanCakeError("This task is not in the trash.")
+        self.restore_task(task)
+
+    @undoable
+    def restore_task(self, task: str):
+        """
+        Move a :param task: from the trash back to the list it was
+        removed from, with its previous status.
+        """
+        flags = self.store[task] & ~TRASHED
+        self.move_task(task, flags)
+        self.record("trash-pop", task)
+        self.record("set", origin(flags), task, STATUS_NAMES[flags & Status.COMPLETE])
+
+    @undoable
+    def recover_all(self):
+        """
+        Recover all the removed tasks.
+        Return the recovered tasks.
+        """
+        recovered = [task for task, status in self.view("trash")]
+        for task in recovered:
+            self.restore_task(task)
+        return recovered
+
+    @undoable
+    def destroy_task(self, task: str):
+        """
+        Remove a task from the trash.
+        The task cannot be recovered.
+        """
+        flags = self.store.get(task)
+        if flags is None:
+            raise PanCakeError("This task doesn't exist.")
+        if not flags & TRASHED:
+            raise PanCakeError("This task is not in the trash.")
+        self.delete_task(task)
+        self.record("trash-pop", task)
+
+    @undoable
+    def empty_trash(self):
+        """
+        Remove all the tasks from the trash.
+        The tasks cannot be recovered.
+        Return the amount of destroyed tasks.
+        """
+        destroyed = [task for task, status in self.view("trash")]
+        for task in destroyed:
+            self.delete_task(task)
+        self.record("trash-clear")
+        return len(destroyed)
+
+    def advancement(self, tag: str=None):
+        """
+        Return the amount of completed and unfinished tasks.
+        :param tag: only the tasks with this tag if given, counted in a
+        time proportional to the amount of lists, not of tasks
+        """
+        if tag is None:
+            return self.complete, self.unfinished
+        breakdown = self.breakdown(tag)
+        return (
+            sum(breakdown[key][0] for key in ("tasks", "important", "secrets")),
+            sum(breakdown[key][1] for key in ("tasks", "important", "secrets")),
+        )
+
+    @undoable
+    def pin_task(self, task: str):
+        """
+        Add a :param task: to the important tasks and remove
+        it from the user tasks.
+        """
+        flags = self.store.get(task)
+        if flags is None or flags & SECRET:
+            raise PanCakeError("This task doesn't exist.")
+        if flags & TRASHED:
+            raise PanCakeError("This task is in the trash.")
+        if flags & PINNED:
+            raise PanCakeError("You already pinned this task.")
+        self.pin_tasks([task])
+
+    @undoable
+    def pin_tasks(self, tasks: list):
+        """
+        Move some user :param tasks: to the important tasks.
+        """
+        for task in tasks:
+            self.move_task(task, Status.UNFINISHED | PINNED)
+            self.record("pop", "tasks", task)
+            self.record("set", "important", task, "Unfinished")
+
+    @undoable
+    def unpin_task(self, task: str):
+        """
+        Remove a task from the important tasks and add
+        it to the user tasks.
+        """
+        flags = self.store.get(task)
+        if flags is None or flags & SECRET:
+            raise PanCakeError("This task doesn't exist.")
+        if flags & TRASHED:
+            raise PanCakeError("This task is in the trash.")
+        if not flags & PINNED:
+            raise PanCakeError("This task is not pinned.")
+        self.move_task(task, Status.UNFINISHED)
+        self.record("pop", "important", task)
+        self.record("set", "tasks", task, "Unfinished")
+
+    def undo(self, password: str=None):
+        """
+        Reverse the last group of changes of the undo log, in a time
+        proportional to its size. The tasks which change of list are put at
+        the end of their list. Changes to the secret tasks require the
+        password, unless they are unlocked.
+        Return the amount of tasks changed back.
+        """
+        if not self.undo_log:
+            raise PanCakeError("Nothing to undo.")
+        self.redo_log.append(self.restore_group(self.undo_log, password))
+        return len(self.redo_log[-1])
+
+    def redo(self, password: str=None):
+        """
+        Make again the last group of changes undone.
+        Return the amount of tasks changed.
+        """
+        if not self.redo_log:
+            raise PanCakeError("Nothing to redo.")
+        self.undo_log.append(self.restore_group(self.redo_log, password))
+        return len(self.undo_log[-1])
+
+    def restore_group(self, log, password: str=None):
+        """
+        Give back their flags, and the dates and tags they have lost, to the
+        tasks of the last group of :param log: and remove it from the log.
+        A task which gets its tags back is put at the end of their tasks.
+        Return the group reversing it.
+        """
+        group = log[-1]
+        store = self.store
+        if any(
+            flags is not None and flags & (SECRET | TRASHED) == SECRET
+            for task, restored in group.items() for flags in (restored, store.get(task))
+        ):
+            self.authorize(password)
+        log.pop()
+        # The dates and tags dropped again are kept in the reverse group
+        reverse = self.undo_group = UndoGroup()
+        try:
+            for task, flags in group.items():
+                previous = store.get(task)
+                reverse[task] = previous
+                if previous == flags:
+                    continue
+                if flags is None:
+                    self.delete_task(task)
+                elif previous is None:
+                    self.put_task(task, flags)
+                    self.index_task(task)
+                elif previous & ~Status.COMPLETE == flags & ~Status.COMPLETE:
+                    self.put_task(task, flags)
+                else:
+                    self.move_task(task, flags)
+                    if flags & (SECRET | TRASHED) == SECRET:
+                        self.drop_attributes(task)
+                self.record_change(task, previous, flags)
+            for task, attributes in group.attributes.items():
+                self.restore_attributes(task, attributes)
+        finally:
+            self.undo_group = None
+        return reverse
+
+    def record_change(self, task: str, previous: int, flags: int):
+        """
+        Tell the storage that the flags of a :param task: have changed from
+        :param previous: to :param flags: (None when the task doesn't exist).
+        """
+        if previous is not None:
+            if previous & TRASHED:
+                if flags is None or not flags & TRASHED:
+                    self.record("trash-pop", task)
+            elif flags is None or flags & TRASHED or origin(flags) != origin(previous):
+                self.record("pop", origin(previous), task)
+        if flags is not None:
+            status = STATUS_NAMES[flags & Status.COMPLETE]
+            if flags & TRASHED:
+                self.record("trash-set", task, {"status": status, "origin": origin(flags)})
+            else:
+                self.record("set", origin(flags), task, status)
+
+    def add_history(self, command: str):
+        """
+        Add a command to the commands history.
+        """
+        self.history.append(command)
+
+    def history_clear(self):
+        """
+        Clear the entire commands history of the user.
+        """
+        self.history.clear()
+        # Drop the history kept in the save file by older versions
+        self.record("history-clear")
+
+    def set_secret_tasks_password(self, precedent_password: str, new_password: str):
+        """
+        Change the password of the secret tasks. Only its hash is kept.
+        """
+        self.check_password(precedent_password)
+        self.password_hash = hash_password(new_password) if new_password else None
+        self.mark_dirty()
+
+    def set_logs_status(self, status: int):
+        """
+        Change the logs status (0, 1 or 2).
+        """
+        if status not in (0, 1, 2):
+            raise PanCakeError("Invalid logs status. Please enter 0, 1, or 2.")
+        self.logs_status = status
+        self.mark_dirty()
+
+    def record(self, *operation):
+        """
+        Tell the storage about a change made to the session. The changes of
+        the secret tasks are written in the secrets file instead.
+        """
+        if operation[0] in ("set", "pop") and operation[1] == "secrets":
+            self.secrets_changed = True
+        else:
+            self.storage.record(operation)
+        self.mark_dirty()
+
+    def mark_dirty(self):
+        """
+        Count a change made to the session, and tell the autosave about it.
+        """
+        self.changes += 1
+        if self.autosave is not None:
+            self.autosave.changed()
+
+    @property
+    def dirty(self):
+        """
+        Whether the session has changed since it was last saved or loaded.
+        """
+        return self.changes != self.saved_changes
+
+    def checkpoint(self):
+        """
+        Tell the storage that a command is done.
+        """
+        self.storage.checkpoint(self)
+
+    def settings(self):
+        """
+        Return the counters and the settings of the session.
+        """
+        return {
+            "complete": self.complete,
+            "unfinished": self.unfinished,
+            "secrets-counts": list(self.breakdown()["secrets"]),
+            "secrets-password-hash": self.password_hash,
+            "logs-status": self.logs_status
+        }
+
+    def snapshot(self):
+        """
+        Return the whole session as it is written in the save file, without
+        the secret tasks (see the secrets file).
+        """
+        data = {
+            "tasks": dict(self.view("tasks")),
+            "trash": {},
+            'important': dict(self.view("important")),
+        }
+        for key in TASK_ATTRIBUTES:
+            data[key] = {task: value[:] if key == "tags" else value for task, value in self.attribute(key).items()}
+        for task, flags in self.store.items():
+            if flags & TRASHED:
+                data["trash"][task] = {"status": STATUS_NAMES[flags & Status.COMPLETE], "origin": origin(flags)}
+        data.update(self.settings())
+        return data
+
+    def store_from_save(self, data: dict):
+        """
+        Build the task store from the lists of a save file :param data:.
+        """
+        self.word_index = None
+        self.name_trie = None
+        self.measured = None
+        self.store = store_from_save(data)
+        self.recount(data.get("counts"))
+
+    def apply(self, data: dict):
+        """
+        Replace the tasks and the settings of the session by the ones of
+        the save file :param data:. The counters are counted from the tasks.
+        """
+        self.store_from_save(data)
+        self.dates = {key: dict(data.get(key, {})) for key in DATE_LISTS}
+        self.date_indexes = dict.fromkeys(DATE_LISTS)
+        if self.timer is not None:
+            self.timer.changed()
+        self.tags = {task: list(tags) for task, tags in data.get("tags", {}).items()}
+        self.index_tags()
+        self.password_hash = data.get("secrets-password-hash")
+        if self.password_hash is None and data.get("secrets-password"):
+            # Older versions kept the password in plain text
+            self.password_hash = hash_password(data["secrets-password"])
+        self.logs_status = data.get("logs-status", 0)
+
+    def refresh(self):
+        """
+        Pick up the changes made by other sessions to the save file, keeping
+        the unsaved changes of this one.
+        Return the amount of changes picked up, and how many of them
+        conflicted with this session (its changes are kept).
+        """
+        with self.lock:
+            return self.storage.refresh(self)
+
+    def export_tasks(self, path: str, password: str=None):
+        """
+        Write the whole session in :param path: as a JSON save file,
+        whatever the storage, secret tasks included, which requires
+        :param password: unless they are unlocked or there are none.
+        """
+        if any(self.breakdown()["secrets"]):
+            self.authorize(password)
+        data = self.snapshot()
+        data["secrets"] = dict(self.view("secrets"))
+        write_atomic(path, data)
+
+    def task_rows(self):
+        """
+        Iterate over the tasks, out of the secret tasks, as rows of
+        ROW_FIELDS (without the empty ones) to be exported.
+        """
+        for task, flags in self.store.items():
+            if flags & (SECRET | TRASHED) == SECRET:
+                continue
+            row = {"name": task, "status": STATUS_NAMES[flags & Status.COMPLETE], "pinned": bool(flags & PINNED), "trashed": bool(flags & TRASHED)}
+            for key, field in zip(DATE_LISTS, ("due", "reminder")):
+                stamp = self.dates[key].get(task)
+                if stamp is not None:
+                    row[field] = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(stamp))
+            if task in self.tags:
+                row["tags"] = list(self.tags[task])
+            yield row
+
+    def import_rows(self, rows: list):
+        """
+        Add the tasks of a batch of imported :param rows: (the row numbers
+        and fields yielded by read_rows). A row which can't be imported is
+        skipped. The new tasks aren't recorded one by one, the storage
+        writes the whole session at the next save instead, and they can't
+        be undone: the undo log is cleared.
+        Return the amount of tasks added and the errors, as row numbers
+        and messages.
+        """
+        # The names may be the ones of secret tasks which haven't been read
+        self.unseal()
+        added = 0
+        errors = []
+        for number, row in rows:
+            try:
+                self.import_row(row)
+                added += 1
+            except PanCakeError as error:
+                errors.append((number, str(error)))
+        if added:
+            self.storage.invalidate()
+            self.undo_log.clear()
+            self.redo_log.clear()
+            if self.timer is not None:
+                self.timer.changed()
+            self.mark_dirty()
+        return added, errors
+
+    def import_row(self, row: dict):
+        """
+        Add the task of an imported :param row:, to the user tasks, the
+        important tasks or the trash.
+        """
+        if isinstance(row, PanCakeError):
+            raise row
+        task = row.get("name")
+        if not isinstance(task, str) or not task.strip():
+            raise PanCakeError("The task has no name.")
+        if "\n" in task or "\r" in task:
+            raise PanCakeError("A task name can't have line breaks.")
+        flags = self.store.get(task)
+        if flags is not None:
+            raise PanCakeError("This task is in the trash." if flags & TRASHED else "Task already added.")
+        status = str(row.get("status") or "Unfinished").capitalize()
+        if status not in STATUS_NAMES:
+            raise PanCakeError(f"Invalid status: {row['status']}.")
+        flags = STATUS_NAMES.index(status)
+        if parse_flag(row.get("pinned")):
+            flags |= PINNED
+        if parse_flag(row.get("trashed")):
+            flags |= TRASHED
+        dates = {}
+        for key, field in zip(DATE_LISTS, ("due", "reminder")):
+            value = row.get(field)
+            if isinstance(value, int) and not isinstance(value, bool):
+                dates[key] = value
+            elif isinstance(value, str) and value.strip():
+                dates[key] = parse_time(value.strip(), key == "due")
+            elif value not in (None, ""):
+                raise PanCakeError(f"Invalid date: {value}.")
+        tags = row.get("tags") or []
+        if isinstance(tags, str):
+            tags = tags.split()
+        if not isinstance(tags, list) or not all(isinstance(tag, str) and tag.split() == [tag] for tag in tags):
+            raise PanCakeError("Invalid tags.")
+        # The dates and tags are set first so that the task is counted and
+        # scheduled by put_task
+        for key, stamp in dates.items():
+            self.dates[key][task] = stamp
+        if tags:
+            self.tags[task] = list(dict.fromkeys(tags))
+            for tag in self.tags[task]:
+                self.tag_index.setdefault(tag, {})[task] = None
+                self.tag_counts.setdefault(tag, [0] * FLAG_COMBINATIONS)
+        self.put_task(task, flags)
+        self.index_task(task)
+
+    def save_tasks(self):
+        """
+        Save the current session.
+        The session is only locked while the storage takes what it writes,
+        so other threads can change it while it is written.
+        Return the amount of bytes written.
+        """
+        start_time = time.perf_counter()
+        # The lock is always taken before saving, so that a thread changing
+        # the session never waits for a save waiting for it
+        with self.lock:
+            self.saving.acquire()
+            try:
+                self.write_secrets()
+                write = self.storage.prepare(self)
+                self.history.flush()
+                changes = self.changes
+            except BaseException:
+                self.saving.release()
+                raise
+        try:
+            size = write()
+            self.saved_changes = changes
+            self.last_save = (time.perf_counter() - start_time, size)
+            return size
+        finally:
+            self.saving.release()
+
+    def saved_secrets_counts(self, data: dict):
+        """
+        Return the amount of unfinished and completed secret tasks saved in
+        the save file :param data:, or deduced from its counters if it was
+        written before they were saved.
+        """
+        if "secrets-counts" in data:
+            complete, unfinished = data["secrets-counts"]
+            return [unfinished, complete]
+        return [max(0, data.get("unfinished", 0) - self.unfinished), max(0, data.get("complete", 0) - self.complete)]
+
+    def write_secrets(self):
+        """
+        Write the secret tasks in the secrets file if they have changed,
+        then drop the ones left in the save file by older versions.
+        """
+        if not self.secrets_changed or self.sealed:
+            return
+        write_atomic(self.secrets_file, {"secrets": dict(self.view("secrets"))})
+        self.secrets_changed = False
+        if self.legacy_secrets:
+            self.storage.record(("secrets-clear",))
+            self.legacy_secrets = False
+
+    def load_tasks(self):
+        """
+        Load the save file.
+        """
+        start_time = time.perf_counter()
+        try:
+            data = self.storage.load()
+        except FileNotFoundError:
+            raise SaveNotFound()
+        except ValueError:
+            raise PanCakeError("Error loading tasks. File may be corrupted.")
+        self.apply(data)
+        self.undo_log.clear()
+        self.redo_log.clear()
+        self.sealed = os.path.exists(self.secrets_file)
+        self.sealed_names = None
+        self.sealed_counts = [0, 0]
+        if self.sealed:
+            self.sealed_counts = self.saved_secrets_counts(data)
+        # Secret tasks left in the save file by older versions are moved to
+        # the secrets file at the next save
+        self.legacy_secrets = any(flags & (SECRET | TRASHED) == SECRET for flags in self.store.values())
+        self.secrets_changed = self.legacy_secrets and not self.sealed
+        self.saved_changes = self.changes
+        self.history.load(data.get("history"))
+        self.last_load = time.perf_counter() - start_time
+
+    def list_sizes(self):
+        """
+        Return the amount of tasks of each list, from the counters.
+        """
+        return {key: complete + unfinished for key, (complete, unfinished) in self.breakdown().items()}
+
+    def memory_size(self):
+        """
+        Return an estimate of the memory taken by the session, in bytes:
+        the task store and the names, the dates, the tags, the word index
+        and the name trie if they are built and the history kept in memory. It goes through the
+        tasks, so it is only computed again once the session has changed.
+        """
+        if self.measured is not None and self.measured[0] == self.changes:
+            return self.measured[1]
+        # A name takes the size of an empty string plus a byte per character
+        # (more for the characters out of Latin-1)
+        size = sys.getsizeof(self.store) + len(self.store) * sys.getsizeof("") + sum(map(len, self.store))
+        size += sum(sys.getsizeof(dates) for dates in self.dates.values())
+        size += sys.getsizeof(self.tags) + sum(map(sys.getsizeof, self.tags.values()))
+        size += sys.getsizeof(self.tag_index) + sum(map(sys.getsizeof, self.tag_index.values()))
+        if self.word_index is not None:
+            postings = self.word_index.postings
+            size += sys.getsizeof(postings) + sum(map(sys.getsizeof, postings.values()))
+            # The ranks of the tasks are tuples, the names being counted above
+            rank_size = sys.getsizeof((0, 0, ""))
+            size += sum(sys.getsizeof(ranked) + len(ranked) * rank_size for ranked in self.word_index.ranked.values())
+        if self.name_trie is not None:
+            size += self.name_trie.memory_size()
+        size += sum(map(sys.getsizeof, self.history.ring))
+        self.measured = (self.changes, size)
+        return size
+
+class ReminderTimer:
+    """
+    Background timer of the reminders of a task manager: a thread sleeps
+    until the next reminder, then removes the reminders whose time has
+    come and calls :param notify: with each task and its time.
+    :param manager: the task manager
+    """
+    def __init__(self, manager: TaskManager, notify):
+        self.manager = manager
+        self.notify = notify
+        self.wake = threading.Event()
+        self.stopped = False
+        self.thread = None
+
+    def start(self):
+        """
+        Start firing the reminders in the background. Those whose time has
+        already come are fired at once.
+        """
+        self.manager.timer = self
+        self.thread = threading.Thread(target=self.run, name="pancake-reminders", daemon=True)
+        self.thread.start()
+
+    def changed(self):
+        """
+        Called by the task manager when the reminders have changed.
+        """
+        self.wake.set()
+
+    def run(self):
+        """
+        Fire the reminders until the timer is stopped.
+        """
+        while not self.stopped:
+            self.wake.clear()
+            with self.manager.lock:
+                fired = self.manager.pop_reminders(time.time())
+                upcoming = self.manager.dated_tasks("reminders", 1)
+            for task, stamp in fired:
+                self.notify(task, stamp)
+            wait = REMINDER_MAX_WAIT
+            if upcoming:
+                wait = min(wait, max(0.0, upcoming[0][1] - time.time()))
+            self.wake.wait(wait)
+
+    def stop(self):
+        """
+        Stop firing the reminders.
+        """
+        self.stopped = True
+        self.manager.timer = None
+        self.wake.set()
+
+class Autosave:
+    """
+    Background saving of a task manager: once the session is dirty, a
+    thread saves it when :param interval: seconds have passed since the
+    last save, or as soon as :param changes: changes have been made.
+    :param manager: the task manager to save
+    :param flushes: how many saves have been made
+    :param flush_time: the total time spent saving, in seconds
+    :param max_flush_time: the longest save, in seconds
+    :param bytes_written: the total amount of bytes written
+    :param error: the message of the last failed save, if any
+    """
+    def __init__(self, manager: TaskManager, interval: float=30.0, changes: int=100):
+        self.manager = manager
+        self.interval = interval
+        self.changes = changes
+        self.flushes = 0
+        self.flush_time = 0.0
+        self.max_flush_time = 0.0
+        self.bytes_written = 0
+        self.error = None
+        self.last_flush = time.monotonic()
+        self.wake = threading.Event()
+        self.stopped = False
+        self.thread = None
+
+    def start(self):
+        """
+        Start saving the task manager in the background.
+        """
+        self.manager.autosave = self
+        self.thread = threading.Thread(target=self.run, name="pancake-autosave", daemon=True)
+        self.thread.start()
+
+    def changed(self):
+        """
+        Called by the task manager with each change: wake the thread up
+        when the session becomes dirty, and when enough changes are waiting.
+        """
+        waiting = self.manager.changes - self.manager.saved_changes
+        if waiting == 1 or waiting >= self.changes:
+            self.wake.set()
+
+    def run(self):
+        """
+        Wait for the session to become dirty, then save it when the interval
+        has passed or enough changes are waiting.
+        """
+        while not self.stopped:
+            timeout = None
+            if self.manager.dirty:
+                timeout = max(0.0, self.last_flush + self.interval - time.monotonic())
+            self.wake.wait(timeout)
+            self.wake.clear()
+            if self.stopped:
+                break
+            manager = self.manager
+            waiting = manager.changes - manager.saved_changes
+            if waiting and (waiting >= self.changes or time.monotonic() - self.last_flush >= self.interval):
+                self.flush()
+
+    def flush(self):
+        """
+        Save the task manager and update the metrics.
+        """
+        start_time = time.perf_counter()
+        try:
+            size = self.manager.save_tasks()
+        except (OSError, PanCakeError) as error:
+            self.error = str(error)
+            return
+        finally:
+            self.last_flush = time.monotonic()
+        elapsed = time.perf_counter() - start_time
+        self.flushes += 1
+        self.flush_time += elapsed
+        self.max_flush_time = max(self.max_flush_time, elapsed)
+        self.bytes_written += size
+        self.error = None
+
+    def stop(self):
+        """
+        Stop the thread, and save the session one last time if it is dirty.
+        The thread isn't joined, since it may be waiting for the lock of the
+        session held by the caller: saves never overlap anyway.
+        Return the message of the last save if it has failed, None
+        otherwise.
+        """
+        self.stopped = True
+        self.wake.set()
+        if self.manager.autosave is self:
+            self.manager.autosave = None
+        if self.manager.dirty:
+            self.flush()
+        return self.error if self.manager.dirty else None
+
+class Workspaces:
+    """
+    Named sessions, each with its own save file: the default workspace is
+    the save file of :param manager:, and each other one has a directory
+    in the workspaces directory next to it, where its files are written
+    (workspaces/<name>/saved_tasks.json), with the same storage.
+    The workspaces left recently stay loaded in a LRU cache, so going back
+    to them is instant, as long as their estimated memory (see
+    TaskManager.memory_size) fits in :param capacity: bytes. A workspace
+    evicted from the cache is saved first if it has changed, and loaded
+    again when it is used.
+    :param current: the name of the workspace in use, whose task manager
+    isn't in the cache
+    :param cache: the task manager and the memory of each workspace kept
+    loaded, the least recently used first
+    :param cached_size: the memory of the workspaces of the cache
+    :param evictions: how many workspaces have been evicted from the cache
+    """
+    def __init__(self, manager: TaskManager, capacity: int=WORKSPACE_CACHE_SIZE):
+        self.save_file = manager.save_file
+        self.storage = next(name for name, storage in STORAGES.items() if type(manager.storage) is storage)
+        self.history_size = manager.history.size
+        self.directory = os.path.join(os.path.dirname(os.path.abspath(self.save_file)), "workspaces")
+        self.capacity = capacity
+        self.current = DEFAULT_WORKSPACE
+        self.cache = collections.OrderedDict()
+        self.cached_size = 0
+        self.evictions = 0
+
+    def path(self, name: str):
+        """
+        Return the save file of the workspace :param name:.
+        """
+        if name == DEFAULT_WORKSPACE:
+            return self.save_file
+        return os.path.join(self.directory, name, os.path.basename(self.save_file))
+
+    def names(self):
+        """
+        Return the names of the workspaces, the default one first.
+        """
+        try:
+            entries = os.listdir(self.directory)
+        except FileNotFoundError:
+            entries = []
+        return [DEFAULT_WORKSPACE] + sorted(name for name in entries if self.valid(name) and os.path.isdir(os.path.join(self.directory, name)))
+
+    @staticmethod
+    def valid(name: str):
+        """
+        Whether :param name: can be the name of a workspace.
+        """
+        return re.fullmatch(r"[\w-][\w.-]*", name) is not None
+
+    def create(self, name: str):
+        """
+        Create the workspace :param name:, without any task.
+        """
+        if not self.valid(name):
+            raise PanCakeError("Invalid workspace name (use letters, digits, '.', '_' and '-').")
+        if name in self.names():
+            raise PanCakeError("This workspace already exists.")
+        os.makedirs(os.path.join(self.directory, name))
+
+    def drop(self, name: str):
+        """
+        Remove the workspace :param name: and its files, without saving it.
+        """
+        if name == DEFAULT_WORKSPACE:
+            raise PanCakeError("The default workspace can't be dropped.")
+        if name == self.current:
+            raise PanCakeError("You can't drop the workspace you are using.")
+        if name not in self.names():
+            raise PanCakeError("This workspace doesn't exist.")
+        cached = self.cache.pop(name, None)
+        if cached is not None:
+            self.cached_size -= cached[1]
+        import shutil
+
+        shutil.rmtree(os.path.join(self.directory, name))
+
+    def load(self, name: str):
+        """
+        Return a new task manager with the session of the workspace
+        :param name:, empty if it has never been saved.
+        """
+        manager = TaskManager(self.path(name), self.storage, self.history_size)
+        try:
+            manager.load_tasks()
+        except SaveNotFound:
+            pass
+        return manager
+
+    def open(self, name: str):
+        """
+        Return the task manager of the workspace :param name:, taken out of
+        the cache or loaded.
+        """
+        if name == self.current:
+            raise PanCakeError("You are already using this workspace.")
+        if name not in self.names():
+            raise PanCakeError("This workspace doesn't exist.")
+        cached = self.cache.pop(name, None)
+        if cached is None:
+            return self.load(name)
+        self.cached_size -= cached[1]
+        return cached[0]
+
+    def leave(self, manager: TaskManager, name: str):
+        """
+        Put the task manager of the current workspace in the cache, the
+        workspace :param name: becoming the current one. The cache is
+        trimmed by evict, once the task manager of :param name: is used.
+        """
+        size = manager.memory_size()
+        self.cache[self.current] = (manager, size)
+        self.cached_size += size
+        self.current = name
+
+    def evict(self):
+        """
+        Remove the least recently used workspaces from the cache until it
+        fits in its capacity, saving those which have changed. A workspace
+        which can't be saved is kept.
+        """
+        while self.cached_size > self.capacity and self.cache:
+            name, (manager, size) = next(iter(self.cache.items()))
+            if manager.dirty:
+                try:
+                    manager.save_tasks()
+                except OSError as error:
+                    raise PanCakeError(f"The workspace {name} can't be saved: {error}")
+            del self.cache[name]
+            self.cached_size -= size
+            self.evictions += 1
+
+    def flush(self):
+        """
+        Save the workspaces of the cache which have changed.
+        Return how many have been saved.
+        """
+        saved = 0
+        for manager, size in self.cache.values():
+            if manager.dirty:
+                manager.save_tasks()
+                saved += 1
+        return saved
+
+    def sessions(self, manager: TaskManager):
+        """
+        Iterate over the workspaces and their task manager: the current one
+        (:param manager:) and those of the cache, then the others, with None
+        since they aren't loaded.
+        """
+        yield self.current, manager
+        for name, (cached, size) in list(self.cache.items()):
+            yield name, cached
+        for name in self.names():
+            if name != self.current and name not in self.cache:
+                yield name, None
+
+    def advancement(self, manager: TaskManager):
+        """
+        Iterate over the workspaces and their amount of completed and
+        unfinished tasks. Those of the workspaces which aren't loaded are
+        read from their save files, one at a time, without reading the
+        tasks when the storage keeps the counters apart (sqlite and binary).
+        """
+        for name, loaded in self.sessions(manager):
+            if loaded is not None:
+                yield name, loaded.advancement()
+                continue
+            try:
+                counters = STORAGES[self.storage](self.path(name)).counters()
+            except FileNotFoundError:
+                counters = (0, 0)
+            except ValueError:
+                raise PanCakeError(f"Error loading the workspace {name}. File may be corrupted.")
+            if counters is None:
+                counters = self.load(name).advancement()
+            yield name, tuple(counters)
+
+    def search(self, manager: TaskManager, terms: list, limit: int=20):
+        """
+        Return the best tasks matching the words of :param terms: in all
+        the workspaces, as their workspace, name, status and list. The
+        workspaces which aren't loaded are loaded one at a time, and
+        dropped once searched.
+        """
+        results = []
+        for name, loaded in self.sessions(manager):
+            if loaded is None:
+                loaded = self.load(name)
+            found = ((name,) + result for result in loaded.search(terms, limit=limit))
+            results = heapq.nsmallest(limit, itertools.chain(results, found), key=lambda result: (len(words(result[1])), len(result[1]), result[1]))
+        return results
+
+class Command:
+    """
+    A command of the PanCake prompt.
+    :param name: the name of the command
+    :param handler: the name of the PanCake method running the command,
+    or a function called with the PanCake instance
+    :param arguments: whether the command takes arguments: "none",
+    "optional" or "required"
+    :param calls: how many times the command has been run
+    :param time: the total time spent running the command, in seconds
+    :param histogram: how many calls fell in each bucket of LATENCY_BUCKETS
+    """
+    __slots__ = ("name", "handler", "arguments", "calls", "time", "histogram")
+
+    def __init__(self, name: str, handler, arguments: str="none"):
+        self.name = name
+        self.handler = handler
+        self.arguments = arguments
+        self.calls = 0
+        self.time = 0.0
+        self.histogram = [0] * len(LATENCY_LABELS)
+
+    def run(self, pancake, argument: list=None):
+        """
+        Check the :param argument: of the command and run it on :param pancake:.
+        The argument of a command which takes none is ignored. The errors of the task manager, and those of the files it uses, are
+        displayed as important messages.
+        """
+        if argument is None and self.arguments == "required":
+            pancake.log_message(f"'{self.name}' needs an argument. Type 'help' to see the commands list.")
+            return
+
+        if isinstance(self.handler, str):
+            handler = getattr(pancake, self.handler)
+        else:
+            handler = functools.partial(self.handler, pancake)
+        start_time = time.perf_counter()
+        try:
+            if self.arguments == "none":
+                handler()
+            else:
+                handler(argument)
+        except PanCakeError as error:
+            pancake.log_message(str(error))
+        except OSError as error:
+            # A file the command reads or writes may be missing or forbidden
+            reason = error.strerror or str(error)
+            if error.filename is not None:
+                reason += f" ({error.filename})"
+            pancake.log_message(f"'{self.name}' failed: {reason}.")
+        finally:
+            elapsed = time.perf_counter() - start_time
+            self.calls += 1
+            self.time += elapsed
+            self.histogram[bisect.bisect_left(LATENCY_BUCKETS, elapsed)] += 1
 
 class PanCake:
     """
-    PanCake class.
-    :param tasks: the user tasks
-    :param important_tasks: the important user tasks
-    :param complete: the completed tasks
-    :param unfinished: the unfinished tasks
-    :param trash: the user trash
+    PanCake prompt: reads the commands, runs them with the task manager
+    and displays the results.
     :param version: the PanCake version
     :param save_file: the PanCake save file
-    :param secret_tasks: the user secret tasks
-    :param secret_tasks_password: the password for the secret tasks
-    :param logs_status: the logs status (2 by default)
-    """
-    def __init__(self, version: str="1.3", save_file=None):
-        self.tasks = {}
-        self.important_tasks = {}
-        self.complete = 0
-        self.unfinished = 0
-        self.trash = []
+    :param interactive: False to drive PanCake from a script instead of the prompt
+    :param password: the secret tasks password used when not interactive
+    :param assume_yes: answer "Y" to every confirmation when not interactive
+    :param storage: the name of the storage used for the save file ("json", "journal" or "sqlite")
+    :param manager: the task manager to use instead of a new one
+    :param workspace_cache: the memory the workspaces left may keep
+    loaded, in bytes (see Workspaces)
+    :param fuzzy: whether a task name which doesn't exist is replaced by
+    the closest one, once confirmed (see resolve_task)
+    :param scripted: whether a script is being run: its saves are done
+    once, at the end
+    :param remote: whether the commands are sent by the clients of a
+    daemon, so that they don't act on the terminal of the daemon
+    """
+    # Commands: name -> (method name, arguments, aliases)
+    # Subclasses can add their own commands to this table
+    COMMANDS = {
+        "help": ("help", "none", ()),
+        "license": ("license", "none", ()),
+        "exit": ("exit", "none", ("quit",)),
+        "tasks": ("display_tasks", "optional", ("ls",)),
+        "trash": ("display_trash", "optional", ()),
+        "new": ("add_task", "required", ("add",)),
+        "remove": ("remove_task", "required", ("rm",)),
+        "complete": ("complete_task", "required", ("done",)),
+        "unfinish": ("unfinish_task", "required", ()),
+        "recover": ("recover_task", "required", ()),
+        "destroy": ("destroy_task", "required", ()),
+        "advancement": ("advancement", "optional", ()),
+        "verify": ("verify", "none", ()),
+        "due": ("due", "optional", ()),
+        "overdue": ("overdue", "none", ()),
+        "next": ("next_due", "optional", ()),
+        "remind": ("remind_task", "optional", ()),
+        "tag": ("tag_task", "required", ()),
+        "untag": ("untag_task", "required", ()),
+        "tags": ("display_tags", "none", ()),
+        "undo": ("undo", "none", ()),
+        "redo": ("redo", "none", ()),
+        "save": ("save_tasks", "none", ()),
+        "load": ("load_tasks", "none", ()),
+        "clear": ("clear_screen", "none", ()),
+        "pin": ("pin_task", "required", ()),
+        "unpin": ("unpin_task", "required", ()),
+        "updated": ("updated", "none", ()),
+        "empty": ("empty_trash", "none", ()),
+        "recoverall": ("recover_all", "none", ()),
+        "full-complete": ("full_complete", "none", ()),
+        "full-unfinish": ("full_unfinish", "none", ()),
+        "history": ("display_history", "optional", ()),
+        "history-clear": ("history_clear", "none", ()),
+        "removeall": ("remove_all", "none", ()),
+        "secrets": ("display_secrets", "optional", ()),
+        "hide": ("add_secret", "required", ()),
+        "show": ("remove_secret", "required", ()),
+        "secrets-setpw": ("secrets_setpw", "optional", ()),
+        "unlock": ("unlock", "optional", ()),
+        "lock": ("lock", "none", ()),
+        "setlogs": ("set_logs", "required", ()),
+        "log": ("log", "required", ()),
+        "timings": ("display_timings", "none", ()),
+        "autosave": ("set_autosave", "optional", ()),
+        "stats": ("display_stats", "none", ()),
+        "profile": ("profile", "required", ()),
+        "search": ("search", "required", ("find",)),
+        "export": ("export_tasks", "required", ()),
+        "import": ("import_tasks", "required", ()),
+        "refresh": ("refresh", "none", ()),
+        "workspace": ("workspace", "optional", ()),
+        "fuzzy": ("set_fuzzy", "optional", ()),
+    }
+
+    # Commands completed with the name of a task of a list (see
+    # TaskManager.name_filter)
+    TASK_COMPLETIONS = {
+        "complete": "tasks", "unfinish": "tasks", "remove": "tasks", "pin": "tasks", "unpin": "tasks",
+        "hide": "tasks", "tag": "tasks", "untag": "tasks", "show": "secrets", "recover": "trash", "destroy": "trash",
+    }
+
+    def __init__(self, version: str="1.3", save_file=None, interactive: bool=True, password: str="", assume_yes: bool=False, storage: str="json", manager: TaskManager=None, history_size: int=HISTORY_SIZE, workspace_cache: int=WORKSPACE_CACHE_SIZE, fuzzy: bool=False):
+        self.manager = manager if manager is not None else TaskManager(save_file, storage, history_size)
+        self.workspaces = Workspaces(self.manager, workspace_cache)
         self.version = version
-        self.history = []
-        self.secret_tasks = {}
-        self.secret_tasks_password = ""
-        self.logs_status = 2
+        self.interactive = interactive
+        self.password = password
+        self.assume_yes = assume_yes
+        self.running = True
+        self.scripted = False
+        self.remote = False
+        self.autosave = None
+        self.reminders = None
+        self.profiler = None
+        self.fuzzy = fuzzy
+        self.completions = []
 
-        if save_file is None:
-            script_dir = os.path.dirname(os.path.realpath(__file__))
-            self.save_file = os.path.join(script_dir, "saved_tasks.json")
-        else:
-            self.save_file = save_file
+        self.commands = {}
+        self.command_names = []
+        for name, (handler, arguments, aliases) in self.COMMANDS.items():
+            self.register_command(name, handler, arguments, aliases)
+
+    @property
+    def logs_status(self):
+        """
+        The logs status, saved with the tasks.
+        """
+        return self.manager.logs_status
+
+    @logs_status.setter
+    def logs_status(self, status: int):
+        self.manager.logs_status = status
+
+    def log_message(self, message: str, level: int=1):
+        """
+        Display a :param message: if the logs status allows it: level 1 is
+        for important messages, level 2 for everything else.
+        """
+        if 0 < level <= self.manager.logs_status:
+            print(message)
+
+    def listing_options(self, argument: list, allowed=("--limit", "--offset", "--count", "--complete", "--unfinished")):
+        """
+        Read the options of a listing command: --limit <n>, --offset <n>,
+        --count, --complete, --unfinished, --pinned and #<tag> (allowed
+        with "#").
+        Return them as a dict.
+        """
+        options = {"limit": None, "offset": 0, "count": False, "status": None, "pinned": False, "tag": None}
+        argument = list(argument or [])
+        while argument:
+            option = argument.pop(0)
+            if option.startswith("#") and len(option) > 1 and "#" in allowed:
+                options["tag"] = option[1:]
+                continue
+            if option not in allowed:
+                raise PanCakeError(f"Unknown option: {option}.")
+            if option in ("--limit", "--offset"):
+                value = argument.pop(0) if argument else ""
+                if not value.isdigit():
+                    raise PanCakeError(f"{option} needs a number.")
+                options[option[2:]] = int(value)
+            elif option == "--count":
+                options["count"] = True
+            elif option == "--complete":
+                options["status"] = Status.COMPLETE
+            elif option == "--unfinished":
+                options["status"] = Status.UNFINISHED
+            elif option == "--pinned":
+                options["pinned"] = True
+        return options
+
+    def write_lines(self, lines):
+        """
+        Write :param lines: with a single write, or by chunks as they come
+        when the output is not a terminal (a pipe or a file).
+        """
+        output = sys.stdout
+        streaming = not output.isatty()
+        buffer = []
+        size = 0
+        for line in lines:
+            buffer.append(line)
+            size += len(line)
+            if streaming and size >= OUTPUT_CHUNK_SIZE:
+                output.write("\n".join(buffer) + "\n")
+                buffer = []
+                size = 0
+        if buffer:
+            output.write("\n".join(buffer) + "\n")
+        output.flush()
+
+    def write_listing(self, items, options: dict, line):
+        """
+        Write the page of :param items: selected by :param options:, each
+        one formatted by :param line:, or only their amount with --count.
+        """
+        if options["count"]:
+            print(sum(1 for item in items))
+            return
+        stop = None if options["limit"] is None else options["offset"] + options["limit"]
+        self.write_lines(line(*item) for item in itertools.islice(items, options["offset"], stop))
+
+    def display_tasks(self, argument: list=None):
+        """
+        Display an enumeration of all the user tasks, important tasks first.
+        With #<tag>, only the tasks with this tag.
+        """
+        options = self.listing_options(argument, ("--limit", "--offset", "--count", "--complete", "--unfinished", "--pinned", "#"))
+        important_tasks = ((True, i, task, status) for i, (task, status) in enumerate(self.manager.view("important", options["status"], options["tag"]), start=1))
+        tasks = ((False, i, task, status) for i, (task, status) in enumerate(self.manager.view("tasks", options["status"], options["tag"]), start=1))
+        items = important_tasks if options["pinned"] else itertools.chain(important_tasks, tasks)
+        # The separator is written before the first user task, if it follows important tasks
+        previous = [False]
+
+        def line(important: bool, i: int, task: str, status: str):
+            text = f"* {i}. {task} - {status}" if important else f"{i}. {task} - {status}"
+            if important and not previous[0]:
+                text = "--> IMPORTANT TASKS\n" + text
+            elif not important and previous[0]:
+                text = "--------------------------------------\n" + text
+            previous[0] = important
+            return text
+
+        self.write_listing(items, options, line)
+
+    def display_trash(self, argument: list=None):
+        """
+        Display an enumeration of all the tasks which are in the trash.
+        """
+        options = self.listing_options(argument)
+        items = enumerate(self.manager.view("trash", options["status"]), start=1)
+        self.write_listing(items, options, lambda i, removed: f"{i}. {removed[0]} - {removed[1]}")
+
+    def display_secrets(self, argument: list=None):
+        """
+        Display an enumeration of all the secret tasks.
+        """
+        options = self.listing_options(argument)
+        secret_tasks = self.manager.secret_tasks(self.secret_password(), options["status"])
+        items = enumerate(secret_tasks, start=1)
+        self.write_listing(items, options, lambda i, secret: f"{i}. {secret[0]} - {secret[1]}")
+
+    def search(self, terms: list):
+        """
+        Display the tasks matching some words, best matches first.
+        With --secrets, the secret tasks are searched too, and with --all,
+        the tasks of every workspace.
+        """
+        if terms[0] == "--all":
+            if len(terms) == 1:
+                raise PanCakeError("'search' needs some words to search.")
+            results = self.workspaces.search(self.manager, terms[1:])
+            if not results:
+                self.log_message("No task found.")
+            names = {"tasks": "tasks", "important": "important tasks", "trash": "trash"}
+            self.write_lines(f"{i}. {task} - {status} ({workspace}: {names[key]})" for i, (workspace, task, status, key) in enumerate(results, start=1))
+            return
+        password = None
+        secrets = terms[0] == "--secrets"
+        if secrets:
+            terms = terms[1:]
+            password = self.secret_password()
+        if not terms:
+            raise PanCakeError("'search' needs some words to search.")
+        results = self.manager.search(terms, password, secrets=secrets)
+        if not results:
+            self.log_message("No task found.")
+        names = {"tasks": "tasks", "important": "important tasks", "secrets": "secret tasks", "trash": "trash"}
+        self.write_lines(f"{i}. {task} - {status} ({names[key]})" for i, (task, status, key) in enumerate(results, start=1))
+
+    def add_task(self, task: list):
+        """
+        Add a new task to the user tasks.
+        """
+        task = " ".join(task)
+        try:
+            self.manager.add_task(task)
+        except PasswordRequired:
+            self.manager.add_task(task, self.secret_password())
+        self.log_message(f"'{task}' has been added to the tasks.", 2)
+
+    def add_secret(self, task: list):
+        """
+        Add a new or an existing task to the secret tasks.
+        """
+        password = self.secret_password()
+        task = " ".join(task)
+        self.manager.add_secret(task, password)
+        self.log_message(f"'{task}' has been added to the secret tasks", 2)
+
+    def remove_secret(self, task: list):
+        """
+        Remove a task from the secret tasks.
+        """
+        password = self.secret_password()
+        task = self.resolve_task(task, "secrets")
+        self.manager.remove_secret(task, password)
+        self.log_message(f"Removing '{task}'...", 2)
+
+    def remove_task(self, task: list):
+        """
+        Move a task to the trash.
+        """
+        if self.bulk("remove", task):
+            return
+        task = self.resolve_task(task)
+        self.manager.remove_task(task)
+        self.log_message(f"Removing '{task}'...", 2)
 
-        self.clear_screen()
-        self.start()
-        self.prompt()
+    def remove_all(self):
+        """
+        Move all the tasks to the trash.
+        """
+        for task in self.manager.remove_all():
+            self.log_message(f"Removing '{task}'...", 2)
 
-    def __repr__(self):
-        return f"TaskManager(tasks={self.tasks}, complete={self.complete}, unfinished={self.unfinished}, trash={self.trash})"
+    def bulk_selection(self, argument: list):
+        """
+        Read a pattern selection: --match <glob>, --regex <regex>,
+        --prefix <prefix> or --tag <tag>, optionally with --dry-run.
+        Return the pattern kind, the pattern and whether it is a dry run,
+        or None if :param argument: is a task name.
+        """
+        kinds = {"--match": "glob", "--regex": "regex", "--prefix": "prefix", "--tag": "tag"}
+        if argument[0] not in kinds:
+            return None
+        dry_run = "--dry-run" in argument[1:]
+        pattern = " ".join(part for part in argument[1:] if part != "--dry-run")
+        if len(pattern) >= 2 and pattern[0] == pattern[-1] and pattern[0] in "'\"":
+            pattern = pattern[1:-1]
+        if argument[0] == "--tag":
+            pattern = pattern.lstrip("#")
+        if not pattern:
+            raise PanCakeError(f"{argument[0]} needs a pattern.")
+        return kinds[argument[0]], pattern, dry_run
 
-    def display_tasks(self):
+    def bulk(self, action: str, argument: list):
         """
-        Display an enumeration of all the user tasks.
+        Run :param action: ("complete", "unfinish", "remove" or "pin") on all
+        the tasks matching a pattern selection, or only display them with
+        --dry-run.
+        Return False if :param argument: is not a pattern selection.
         """
-        if self.important_tasks:
-            print("--> IMPORTANT TASKS")
-            for i, (task, status) in enumerate(self.important_tasks.items(), start=1):
-                print(f"* {i}. {task} - {status}")
+        selection = self.bulk_selection(argument)
+        if selection is None:
+            return False
+        kind, pattern, dry_run = selection
+        keys = ("tasks",) if action == "pin" else ("tasks", "important")
+        tasks = self.manager.match_tasks(pattern, kind, keys)
+        if dry_run:
+            self.write_lines(f"{i}. {task}" for i, task in enumerate(tasks, start=1))
+            self.log_message(f"{len(tasks)} tasks would be affected by '{action}'.")
+            return True
+        if action == "complete":
+            changed = self.manager.set_statuses(tasks, Status.COMPLETE)
+        elif action == "unfinish":
+            changed = self.manager.set_statuses(tasks, Status.UNFINISHED)
+        elif action == "remove":
+            self.manager.remove_tasks(tasks)
+            changed = len(tasks)
+        else:
+            self.manager.pin_tasks(tasks)
+            changed = len(tasks)
+        self.log_message(f"'{action}' matched {len(tasks)} tasks and changed {changed} of them.")
+        return True
 
-        if self.tasks and self.important_tasks:
-            print("--------------------------------------")
+    def complete_task(self, task: list):
+        """
+        Complete a user task, asking the password if it is secret.
+        """
+        if self.bulk("complete", task):
+            return
+        task = self.resolve_task(task)
+        try:
+            self.manager.complete_task(task)
+        except PasswordRequired:
+            self.manager.complete_task(task, self.secret_password())
 
-        if self.tasks:
-            for i, (task, status) in enumerate(self.tasks.items(), start=1):
-                print(f"{i}. {task} - {status}")
+    def full_complete(self):
+        """
+        Complete all the user tasks.
+        """
+        for task in self.manager.full_complete():
+            self.log_message(f"Completing '{task}'...", 2)
 
-    def display_trash(self):
+    def unfinish_task(self, task: list):
         """
-        Display an enumeration of all the tasks which are in the trash.
+        Mark a user task as unfinished, asking the password if it is secret.
         """
-        for i, task in enumerate(self.trash, start=1):
-            print(f"{i}. {task}")
+        if self.bulk("unfinish", task):
+            return
+        task = self.resolve_task(task)
+        try:
+            self.manager.unfinish_task(task)
+        except PasswordRequired:
+            self.manager.unfinish_task(task, self.secret_password())
 
-    def display_secrets(self):
+    def full_unfinish(self):
         """
-        Display an enumeration of all the secret tasks.
+        Mark all the user tasks as unfinished.
         """
-        password = input("Enter password: ")
-        if password == self.secret_tasks_password:
-            for i, (task, status) in enumerate(self.secret_tasks.items(), start=1):
-                print(f"{i}. {task} - {status}")
-        else:
-            if self.logs_status == 1 or self.logs_status == 2:
-                print("Wrong password.")
+        for task in self.manager.full_unfinish():
+            self.log_message(f"Marking '{task}' as unfinished...", 2)
 
-    def add_task(self, task: str):
+    def set_date(self, key: str, argument: list):
         """
-        Add a new task to the user tasks.
+        Give a due date or a reminder (:param key: "due" or "reminders") to
+        a task, from the command :param argument: "<date> <task>", or
+        remove it with "none <task>".
         """
-        task = " ".join(task)
-        if task not in self.tasks:
-            self.tasks[task] = "Unfinished"
-            self.unfinished += 1
+        if len(argument) < 2:
+            raise PanCakeError("Please enter a date (or 'none') and a task.")
+        task = " ".join(argument[1:])
+        if argument[0] == "none":
+            self.manager.set_date(key, task)
+            self.log_message(f"'{task}' has no {'due date' if key == 'due' else 'reminder'} anymore.", 2)
+            return
+        stamp = parse_time(argument[0], end_of_day=key == "due")
+        self.manager.set_date(key, task, stamp)
+        self.log_message(f"'{task}' is {'due' if key == 'due' else 'to be reminded'} {format_time(stamp)}.", 2)
 
-            # LOG
-            if self.logs_status == 2:
-                print(f"'{task}' has been added to the tasks.")
-            # ENDLOG
+    def display_dates(self, key: str, items: list):
+        """
+        Display an enumeration of tasks and their due date or reminder.
+        """
+        if not items:
+            self.log_message("No task found.")
+        now = time.time()
+        word = "due" if key == "due" else "reminder"
+        self.write_lines(
+            f"{i}. {task} - {word} {format_time(stamp)}" + (" (overdue)" if key == "due" and stamp < now else "")
+            for i, (task, stamp) in enumerate(items, start=1)
+        )
 
+    def due(self, argument: list=None):
+        """
+        Display the unfinished tasks with a due date, soonest first, or
+        give one to a task with 'due <date> <task>'.
+        """
+        if argument:
+            self.set_date("due", argument)
         else:
-            if self.logs_status == 1 or self.logs_status == 2:
-                print("Task already added.")
+            self.display_dates("due", self.manager.dated_tasks("due"))
 
-    def add_secret(self, task: str):
+    def overdue(self):
         """
-        Add a new or an existing task to the secret tasks.
+        Display the unfinished tasks whose due date has passed.
         """
-        password = input("Enter password: ")
-        if password == self.secret_tasks_password:
-            task = " ".join(task)
-            if task in self.tasks:
-                self.secret_tasks[task] = self.tasks[task]
-                self.tasks.pop(task)
-
-                # LOG
-                if self.logs_status == 2:
-                    print(f"'{task}' has been added to the secret tasks")
-                # ENDLOG
-
-            elif task in self.important_tasks:
-                self.secret_tasks[task] = self.important_tasks[task]
-                self.important_tasks.pop(task)
-            elif task in self.trash:
-                if self.logs_status == 1 or self.logs_status == 2:
-                    print("This task is in the trash.")
-            else:
-                self.secret_tasks[task] = "Unfinished"
-        else:
-            if self.logs_status == 1 or self.logs_status == 2:
-                print("Wrong password.")
+        self.display_dates("due", self.manager.dated_tasks("due", before=int(time.time())))
 
-    def remove_secret(self, task: str):
+    def next_due(self, argument: list=None):
         """
-        Remove a task from the secret tasks.
+        Display the next unfinished tasks to be done by due date (5 unless
+        an amount is given).
         """
-        password = input("Enter password: ")
-        if password == self.secret_tasks_password:
-            task = " ".join(task)
-            if task in self.secret_tasks:
-                if self.logs_status == 2:
-                    print(f"Removing '{task}'...")
-                self.tasks[task] = self.secret_tasks[task]
-                self.secret_tasks.pop(task)
-            else:
-                if self.logs_status == 1 or self.logs_status == 2:
-                    print("This task is not hidden.")
-        else:
-            if self.logs_status == 1 or self.logs_status == 2:
-                print("Wrong password.")
+        try:
+            amount = int(argument[0]) if argument else 5
+        except ValueError:
+            raise PanCakeError("Please enter an amount of tasks.")
+        self.display_dates("due", self.manager.dated_tasks("due", amount))
 
-    def remove_task(self, task: str):
+    def remind_task(self, argument: list=None):
         """
-        Move a task to the trash.
+        Display the reminders to come, soonest first, or give one to a task
+        with 'remind <date> <task>'.
         """
-        task = " ".join(task)
-        if task in self.tasks:
-            if self.logs_status == 2:
-                print(f"Removing '{task}'...")
-            removed_task = self.tasks.pop(task)
-            self.trash.append(task)
-            if removed_task == "Complete":
-                self.complete -= 1
-            else:
-                self.unfinished -= 1
-        elif task in self.important_tasks:
-            if self.logs_status == 2:
-                print(f"Removing '{task}'...")
-            removed_task = self.important_tasks.pop(task)
-            self.trash.append(task)
-            if removed_task == "Complete":
-                self.complete -= 1
-            else:
-                self.unfinished -= 1
+        if argument:
+            self.set_date("reminders", argument)
         else:
-            if self.logs_status == 1 or self.logs_status == 2:
-                print("This task doesn't exist.")
+            self.display_dates("reminders", self.manager.dated_tasks("reminders"))
 
-    def remove_all(self):
+    def tag_task(self, argument: list):
         """
-        Move all the tasks to the trash.
+        Give a tag to a task: 'tag <task> <tag>'.
         """
-        for task in list(self.tasks):
-            if self.logs_status == 2:
-                print(f"Removing '{task}'...")
-            removed_task = self.tasks.pop(task)
-            self.trash.append(task)
-            if removed_task == "Complete":
-                self.complete -= 1
-            else:
-                self.unfinished -= 1
+        if len(argument) < 2:
+            raise PanCakeError("Please enter a task and a tag.")
+        task, tag = self.resolve_task(argument[:-1]), argument[-1].lstrip("#")
+        self.manager.tag_task(task, tag)
+        self.log_message(f"'{task}' has been tagged #{tag}.", 2)
 
-    def complete_task(self, task: str):
+    def untag_task(self, argument: list):
         """
-        Complete a user task.
+        Remove a tag from a task: 'untag <task> <tag>'.
         """
-        task = " ".join(task)
-        if task in self.tasks:
-            if self.tasks[task] != "Complete":
-                self.tasks[task] = "Complete"
-                self.complete += 1
-                self.unfinished -= 1
-            else:
-                if self.logs_status == 1 or self.logs_status == 2:
-                    print("Task already complete.")
-        elif task in self.important_tasks:
-            if self.important_tasks[task] != "Complete":
-                self.important_tasks[task] = "Complete"
-                self.complete += 1
-                self.unfinished -= 1
-            else:
-                if self.logs_status == 1 or self.logs_status == 2:
-                    print("Task already complete.")
-        elif task in self.secret_tasks:
-            password = input("Enter password: ")
-            if password == self.secret_tasks_password:
-                if self.secret_tasks[task] != "Complete":
-                    self.secret_tasks[task] = "Complete"
-                    self.complete += 1
-                    self.unfinished -= 1
-            else:
-                if self.logs_status == 1 or self.logs_status == 2:
-                    print("Wrong password.")
-        else:
-            if self.logs_status == 1 or self.logs_status == 2:
-                print("This task doesn't exist.")
+        if len(argument) < 2:
+            raise PanCakeError("Please enter a task and a tag.")
+        task, tag = self.resolve_task(argument[:-1]), argument[-1].lstrip("#")
+        self.manager.untag_task(task, tag)
+        self.log_message(f"'{task}' isn't tagged #{tag} anymore.", 2)
 
-    def full_complete(self):
+    def display_tags(self):
         """
-        Complete all the user tasks.
+        Display the tags and the advancement of their tasks.
         """
-        for task in self.tasks:
-            if self.logs_status == 2:
-                print(f"Completing '{task}'...")
-            if self.tasks[task] == "Unfinished":
-                self.tasks[task] = "Complete"
-                self.complete += 1
-                self.unfinished -= 1
-        for task in self.important_tasks:
-            if self.logs_status == 2:
-                print(f"Completing '{task}'...")
-            if self.important_tasks[task] == "Unfinished":
-                self.important_tasks[task] = "Complete"
-                self.complete += 1
-                self.unfinished -= 1
-
-    def unfinish_task(self, task: str):
+        sizes = self.manager.tag_sizes()
+        if not sizes:
+            self.log_message("No task has a tag.")
+        self.write_lines(f"#{tag} - {complete} complete, {unfinished} unfinished" for tag, (complete, unfinished) in sizes.items())
+
+    def undo(self):
         """
-        Mark a user task as unfinished.
+        Undo the last command which has changed the tasks, asking the
+        password if it has changed secret tasks.
         """
-        task = " ".join(task)
-        if task in self.tasks:
-            if self.tasks[task] != "Unfinished":
-                self.tasks[task] = "Unfinished"
-                self.complete -= 1
-                self.unfinished += 1
-        elif task in self.important_tasks:
-            if self.important_tasks[task] != "Unfinished":
-                self.important_tasks[task] = "Unfinished"
-                self.complete -= 1
-                self.unfinished += 1
-        elif task in self.secret_tasks:
-            password = input("Enter password: ")
-            if password == self.secret_tasks_password:
-                if self.secret_tasks[task] != "Unfinished":
-                    self.secret_tasks[task] = "Unfinished"
-                    self.complete -= 1
-                    self.unfinished += 1
-            else:
-                if self.logs_status == 1 or self.logs_status == 2:
-                    print("Wrong password.")
-        else:
-            if self.logs_status == 1 or self.logs_status == 2:
-                print("This task doesn't exist.")
+        try:
+            changed = self.manager.undo()
+        except PasswordRequired:
+            changed = self.manager.undo(self.secret_password())
+        self.log_message(f"Undone: {changed} task(s) changed back.", 2)
 
-    def full_unfinish(self):
+    def redo(self):
         """
-        Mark all the user tasks as unfinished.
+        Redo the last command undone.
         """
-        for task in self.tasks:
-            if self.logs_status == 2:
-                print(f"Marking '{task}' as unfinished...")
-            if self.tasks[task] == "Complete":
-                self.tasks[task] = "Unfinished"
-                self.complete -= 1
-                self.unfinished += 1
-        for task in self.important_tasks:
-            if self.logs_status == 2:
-                print(f"Marking '{task}' as unfinished...")
-            if self.important_tasks[task] == "Complete":
-                self.important_tasks[task] = "Unfinished"
-                self.complete -= 1
-                self.unfinished += 1
+        try:
+            changed = self.manager.redo()
+        except PasswordRequired:
+            changed = self.manager.redo(self.secret_password())
+        self.log_message(f"Redone: {changed} task(s) changed.", 2)
 
-    def recover_task(self, task: str):
+    def recover_task(self, task: list):
         """
         Recover a removed task.
         """
-        task = " ".join(task)
-        if task in self.trash:
-            self.trash.remove(task)
-            self.tasks[task] = "Unfinished"
-            self.unfinished += 1
-        elif task in self.tasks:
-            if self.logs_status == 1 or self.logs_status == 2:
-                print("This task is not in the trash.")
-        else:
-            if self.logs_status == 1 or self.logs_status == 2:
-                print("This task doesn't exist.")
+        self.manager.recover_task(self.resolve_task(task, "trash"))
 
     def recover_all(self):
         """
         Recover all the removed tasks.
         """
-        removed_tasks = self.trash
-        for task in removed_tasks:
-            print(f"Recovering '{task}'...")
-            self.tasks[task] = "Unfinished"
-        self.trash = []
+        for task in self.manager.recover_all():
+            self.log_message(f"Recovering '{task}'...", 2)
 
-    def destroy_task(self, task: str):
+    def destroy_task(self, task: list):
         """
         Remove a task from the trash.
         The task cannot be recovered.
         """
-        task = " ".join(task)
-        if task in self.trash:
-            self.trash.remove(task)
-        elif task in self.tasks:
-            if self.logs_status == 1 or self.logs_status == 2:
-                print("This task is not in the trash.")
-        else:
-            if self.logs_status == 1 or self.logs_status == 2:
-                print("This task doesn't exist.")
+        self.manager.destroy_task(self.resolve_task(task, "trash"))
 
     def empty_trash(self):
         """
         Remove all the tasks from the trash.
         The tasks cannot be recovered.
         """
-        confirmation = input("The tasks cannot be recovered. Are you sure you want to do that (Y/n)? ")
+        confirmation = self.ask_confirmation("The tasks cannot be recovered. Are you sure you want to do that (Y/n)? ")
         if confirmation == "Y":
-            if self.logs_status == 2:
-                print(f"Clearing trash...")
-            self.trash.clear()
+            self.log_message("Clearing trash...", 2)
+            self.manager.empty_trash()
+
+    def advancement(self, argument: list=None):
+        """
+        Display the amount of completed and unfinished tasks, then of each
+        list. With #<tag>, only the tasks with this tag.
+        """
+        if argument == ["--all"]:
+            self.workspaces_advancement()
+            return
+        tag = argument[0].lstrip("#") if argument else None
+        if tag is not None and tag not in self.manager.tag_index:
+            raise PanCakeError("No task has this tag.")
+        complete, unfinished = self.manager.advancement(tag)
+        print(f"You have completed {complete} tasks.")
+        print(f"You have {unfinished} more tasks to complete.")
+        names = {"tasks": "Tasks", "important": "Important tasks", "secrets": "Secret tasks", "trash": "Trash"}
+        for key, (complete, unfinished) in self.manager.breakdown(tag).items():
+            if tag is not None and key == "secrets":
+                continue
+            print(f"{names[key] + ':':<17}{complete:>8} complete {unfinished:>8} unfinished")
+
+    def workspaces_advancement(self):
+        """
+        Display the amount of completed and unfinished tasks of every
+        workspace, then of all of them.
+        """
+        total = [0, 0]
+        for name, (complete, unfinished) in self.workspaces.advancement(self.manager):
+            print(f"{name + ':':<17}{complete:>8} complete {unfinished:>8} unfinished")
+            total[0] += complete
+            total[1] += unfinished
+        print(f"You have completed {total[0]} tasks in all your workspaces, {total[1]} more to complete.")
 
-    def advancement(self):
+    def verify(self):
         """
-        Display the amount of completed and unfinished tasks.
+        Count all the tasks again and repair the counters if they have
+        drifted.
         """
-        print(f"You have completed {self.complete} tasks.")
-        print(f"You have {self.unfinished} more tasks to complete.")
+        drift, duration = self.manager.verify()
+        names = {"tasks": "tasks", "important": "important tasks", "secrets": "secret tasks", "trash": "trash"}
+        for key, (complete, unfinished) in drift.items():
+            self.log_message(f"The counters of the {names.get(key, key)} were off by {complete:+} complete and {unfinished:+} unfinished, they have been repaired.")
+        if not drift:
+            self.log_message("The counters are right.", 2)
+        self.log_message(f"Checked in {duration * 1000:.3f}ms.", 2)
 
     def save_tasks(self):
         """
         Save the current session.
+        When running a script, the session is saved only once at the end.
         """
-        if self.logs_status == 1 or self.logs_status == 2:
-            print("Saving...")
-        data = {
-            "tasks": self.tasks,
-            "trash": self.trash,
-            "complete": self.complete,
-            "unfinished": self.unfinished,
-            'important':self.important_tasks,
-            'history': self.history,
-            "secrets": self.secret_tasks,
-            "secrets-password": self.secret_tasks_password,
-            "logs-status": self.logs_status
-        }
-        with open(self.save_file, 'w') as save_file:
-            json.dump(data, save_file)
-        if self.logs_status == 1 or self.logs_status == 2:
-            print("Saved.")
+        if self.scripted:
+            return
+        self.log_message("Saving...")
+        self.manager.save_tasks()
+        picked, conflicts = self.manager.storage.merged
+        if picked:
+            self.log_message(f"Merged {picked} changes from other sessions ({conflicts} conflicting with yours, yours are kept).")
+        others = self.workspaces.flush()
+        if others:
+            self.log_message(f"Saved {others} other workspaces kept loaded.", 2)
+        self.log_message("Saved.")
+
+    def refresh(self):
+        """
+        Pick up the changes saved by other sessions.
+        """
+        picked, conflicts = self.manager.refresh()
+        if picked:
+            self.log_message(f"Picked up {picked} changes from other sessions ({conflicts} conflicting with yours, yours are kept).")
+        else:
+            self.log_message("Already up to date.", 2)
+
+    def workspace(self, argument: list=None):
+        """
+        Display the current workspace, or list, use, create or drop
+        workspaces.
+        """
+        if argument is None:
+            print(f"You are using the workspace {self.workspaces.current}.")
+        elif argument == ["list"]:
+            self.display_workspaces()
+        elif len(argument) == 2 and argument[0] == "use":
+            self.use_workspace(argument[1])
+        elif len(argument) == 2 and argument[0] == "new":
+            self.workspaces.create(argument[1])
+            self.log_message(f"The workspace {argument[1]} has been created.", 2)
+            self.use_workspace(argument[1])
+        elif len(argument) == 2 and argument[0] == "drop":
+            confirmation = self.ask_confirmation(f"The tasks of the workspace {argument[1]} cannot be recovered. Are you sure you want to do that (Y/n)? ")
+            if confirmation == "Y":
+                self.workspaces.drop(argument[1])
+                self.log_message(f"The workspace {argument[1]} has been dropped.", 2)
+        else:
+            raise PanCakeError("Usage: workspace [list|use <name>|new <name>|drop <name>]")
+
+    def display_workspaces(self):
+        """
+        Display the workspaces, whether they are loaded and the memory of
+        the cache.
+        """
+        workspaces = self.workspaces
+        lines = []
+        for name in workspaces.names():
+            if name == workspaces.current:
+                lines.append(f"* {name} (current)")
+            elif name in workspaces.cache:
+                lines.append(f"  {name} (loaded, {workspaces.cache[name][1] / 1024 / 1024:.1f} MB)")
+            else:
+                lines.append(f"  {name}")
+        lines.append(f"Cache: {workspaces.cached_size / 1024 / 1024:.1f} MB of {workspaces.capacity / 1024 / 1024:.0f} MB, {workspaces.evictions} workspaces evicted.")
+        self.write_lines(lines)
+
+    def use_workspace(self, name: str):
+        """
+        Switch to the workspace :param name:. The current one stays loaded
+        in the cache, with its changes, and the autosave and the reminders
+        follow the new one.
+        """
+        manager = self.workspaces.open(name)
+        autosave = self.autosave
+        error = self.stop_autosave()
+        if error is not None:
+            # The workspace left keeps its changes in the cache
+            self.log_message(f"The workspace {self.workspaces.current} couldn't be saved: {error}")
+        if self.reminders is not None:
+            self.reminders.stop()
+        # The secret tasks are unlocked for one workspace only
+        self.manager.lock_secrets()
+        self.workspaces.leave(self.manager, name)
+        self.manager = manager
+        if self.reminders is not None:
+            self.reminders = ReminderTimer(manager, self.notify_reminder)
+            self.reminders.start()
+        if autosave is not None:
+            self.start_autosave(autosave.interval, autosave.changes)
+        self.log_message(f"You are now using the workspace {name}.", 2)
+        self.workspaces.evict()
+
+    def export_tasks(self, path: list):
+        """
+        Write the session in a JSON save file, or its tasks in a CSV or
+        JSON Lines file (.csv or .jsonl).
+        """
+        path = " ".join(path)
+        rows = path.endswith((".csv", ".jsonl"))
+        try:
+            if rows:
+                count = write_rows(path, self.manager.task_rows(), lambda count: self.log_message(f"{count} tasks exported...", 2))
+            else:
+                try:
+                    self.manager.export_tasks(path)
+                except PasswordRequired:
+                    self.manager.export_tasks(path, self.secret_password())
+        except OSError as error:
+            raise PanCakeError(f"Can't write {path}: {error.strerror}.")
+        if rows:
+            self.log_message(f"{count} tasks exported to {path}.", 2)
+        else:
+            self.log_message(f"Session exported to {path}.", 2)
+
+    def import_tasks(self, path: list):
+        """
+        Add the tasks of a CSV or JSON Lines file, read by batches. The
+        rows which can't be imported are displayed (the first ones) and
+        skipped.
+        """
+        path = " ".join(path)
+        rows = read_rows(path)
+        added = 0
+        errors = []
+        failed = 0
+        try:
+            while True:
+                batch = list(itertools.islice(rows, TRANSFER_BATCH_SIZE))
+                if not batch:
+                    break
+                batch_added, batch_errors = self.manager.import_rows(batch)
+                added += batch_added
+                failed += len(batch_errors)
+                errors.extend(batch_errors[:MAX_IMPORT_ERRORS - len(errors)])
+                if len(batch) == TRANSFER_BATCH_SIZE:
+                    self.log_message(f"{added + failed} rows read, {added} tasks imported...", 2)
+        except OSError as error:
+            raise PanCakeError(f"Can't read {path}: {error.strerror}.")
+        except UnicodeDecodeError:
+            raise PanCakeError(f"Can't read {path}: it isn't UTF-8 text.")
+        for number, message in errors:
+            self.log_message(f"Row {number}: {message}")
+        if failed > len(errors):
+            self.log_message(f"... and {failed - len(errors)} other rows.")
+        self.log_message(f"{added} tasks imported from {path}" + (f", {failed} rows skipped." if failed else "."))
 
     def load_tasks(self):
         """
         Load the save file.
         """
-        if self.logs_status == 1 or self.logs_status == 2:
-            print("Loading...")
-        try:
-            with open(self.save_file, 'r') as save_file:
-                data = json.load(save_file)
-                self.tasks = data.get("tasks", {})
-                self.trash = data.get("trash", [])
-                self.complete = data.get("complete", 0)
-                self.unfinished = data.get("unfinished", 0)
-                self.important_tasks = data.get("important", [])
-                self.history = data.get("history", [])
-                self.secret_tasks = data.get("secrets", {})
-                self.secret_tasks_password = data.get("secrets-password", "")
-                self.logs_status = data.get("logs-status", 0)
-            if self.logs_status == 1 or self.logs_status == 2:
-                print("Tasks loaded successfully.")
-        except FileNotFoundError:
-            if self.logs_status == 1 or self.logs_status == 2:
-                print("No saved tasks found.")
-        except json.JSONDecodeError:
-            if self.logs_status == 1 or self.logs_status == 2:
-                print("Error loading tasks. File may be corrupted.")
+        self.log_message("Loading...")
+        self.manager.load_tasks()
+        self.log_message("Tasks loaded successfully.")
 
     def clear_screen(self):
         """
         Clear the screen.
         """
+        if self.remote:
+            raise PanCakeError("The screen can't be cleared through the daemon.")
         os.system('clear' if os.name == 'posix' else 'cls')
 
-    def pin_task(self, task: str):
+    def pin_task(self, task: list):
         """
-        Add a :param task: to the important tasks and remove
+        Add a task to the important tasks and remove
         it from the user tasks.
         """
-        task = " ".join(task)
-        if task in self.tasks:
-            self.tasks.pop(task)
-            self.important_tasks[task] = "Unfinished"
-        elif task in self.important_tasks:
-            if self.logs_status == 1 or self.logs_status == 2:
-                print("You already pinned this task.")
-        elif task in self.trash:
-            if self.logs_status == 1 or self.logs_status == 2:
-                print("This task is in the trash.")
-        else:
-            if self.logs_status == 1 or self.logs_status == 2:
-                print("This task doesn't exist.")
+        if self.bulk("pin", task):
+            return
+        self.manager.pin_task(self.resolve_task(task))
 
-    def unpin_task(self, task: str):
+    def unpin_task(self, task: list):
         """
         Remove a task from the important tasks and add
         it to the user tasks.
         """
-        task = " ".join(task)
-        if task in self.important_tasks:
-            self.important_tasks.pop(task)
-            self.tasks[task] = "Unfinished"
-        elif task in self.tasks:
-            if self.logs_status == 1 or self.logs_status == 2:
-                print("This task is not pinned.")
-        elif task in self.trash:
-            if self.logs_status == 1 or self.logs_status == 2:
-                print("This task is in the trash.")
-        else:
-            if self.logs_status == 1 or self.logs_status == 2:
-                print("This task doesn't exist.")
+        self.manager.unpin_task(self.resolve_task(task))
 
-    def display_history(self):
+    def display_history(self, argument: list=None):
         """
-        Display the current commands history of the user.
+        Display the current commands history of the user, or only the
+        commands containing some text with 'history search <text>'.
         """
-        for i, command in enumerate(self.history, start=1):
-            print(f"{i}. {command}")
+        if argument and argument[0] == "search":
+            if len(argument) < 2:
+                raise PanCakeError("'history search' needs some text.")
+            items = self.manager.history.search(" ".join(argument[1:]))
+            self.write_lines(f"{i}. {command}" for i, command in items)
+            return
+        options = self.listing_options(argument, ("--limit", "--offset", "--count"))
+        items = enumerate(self.manager.history, start=1)
+        self.write_listing(items, options, lambda i, command: f"{i}. {command}")
 
     def history_clear(self):
         """
         Clear the entire commands history of the user.
         """
-        if self.logs_status == 2:
-            print("Clearing the commands history...")
-        self.history.clear()
+        self.log_message("Clearing the commands history...", 2)
+        self.manager.history_clear()
 
-    def set_secret_tasks_password(self):
+    def set_secret_tasks_password(self, new_password: str=None):
         """
         Change the password of the secret tasks.
+        :param new_password: the new password, asked twice if not given
         """
-        precedent_password = input("Enter precedent password: ")
-        if precedent_password == self.secret_tasks_password:
-            new_password = input("Enter new password: ")
-            new_password_repeat = input("Repeat new password: ")
-            if new_password_repeat == new_password:
-                self.secret_tasks_password = new_password_repeat
-                confirm_save = input("Password has been modified. Do you want to save? (Y/n) ")
-                if confirm_save == "Y":
-                    self.save_tasks()
-            else:
-                if self.logs_status == 1 or self.logs_status == 2:
-                    print("The two passwords are different.")
-        else:
-            if self.logs_status == 1 or self.logs_status == 2:
-                print("Wrong password.")
+        precedent_password = self.ask_password("Enter precedent password: ")
+        self.manager.check_password(precedent_password)
+        if new_password is None:
+            new_password = self.ask_password("Enter new password: ")
+            new_password_repeat = self.ask_password("Repeat new password: ")
+            if new_password_repeat != new_password:
+                raise PanCakeError("The two passwords are different.")
+        self.manager.set_secret_tasks_password(precedent_password, new_password)
+        confirm_save = self.ask_confirmation("Password has been modified. Do you want to save? (Y/n) ")
+        if confirm_save == "Y":
+            self.save_tasks()
 
     def help(self):
         """
@@ -480,7 +4168,7 @@ class PanCake:
         print("PanCake Help -- see more at https://github.com/TRWIther/pancake")
         print("============================================================================")
         print("help                     ->        display this message")
-        print("tasks                    ->        display all your tasks")
+        print("tasks [options]          ->        display all your tasks (see below for the options)")
         print("trash                    ->        display the content of the trash")
         print("new <task>               ->        add a new task")
         print("remove <task>            ->        add a task to the trash")
@@ -488,11 +4176,27 @@ class PanCake:
         print("unfinish <task>          ->        unfinish a task")
         print("recover <task>           ->        recover a removed task")
         print("destroy <task>           ->        remove a task from the trash")
-        print("advancement              ->        see the tasks advancement")
+        print("advancement [#<tag>]     ->        see the tasks advancement, and of each list (of a tag's tasks with #<tag>, of each workspace with --all)")
+        print("verify                   ->        count the tasks again and repair the counters")
+        print("due [<date> <task>]      ->        display the tasks by due date, or give a due date to a task ('none' removes it)")
+        print("overdue                  ->        display the tasks whose due date has passed")
+        print("next [<n>]               ->        display the next 5 (or n) tasks to be done by due date")
+        print("remind [<date> <task>]   ->        display the reminders, or remind you of a task at a date ('none' removes it)")
+        print("tag <task> <tag>         ->        give a tag to a task (then 'tasks #<tag>' or 'complete --tag <tag>')")
+        print("untag <task> <tag>       ->        remove a tag from a task")
+        print("tags                     ->        display the tags and their advancement")
+        print("undo                     ->        undo the last command which has changed your tasks")
+        print("redo                     ->        redo the last command undone")
         print("exit                     ->        exit PanCake")
         print("license                  ->        display the MIT License terms for PanCake")
         print("save                     ->        save your current tasks")
         print("load                     ->        load a save file")
+        print("export <file>            ->        write your session in a JSON save file, or your tasks in a .csv or .jsonl file")
+        print("import <file>            ->        add the tasks of a .csv or .jsonl file")
+        print("refresh                  ->        pick up the changes saved by other sessions (shared storage)")
+        print("workspace [list]         ->        display the current workspace, or all of them")
+        print("workspace use <name>     ->        switch to another workspace (new <name> creates one, drop <name> removes one)")
+        print("fuzzy [on|off]           ->        suggest the closest task when a task name doesn't exist")
         print("clear                    ->        clear the screen")
         print("pin <task>               ->        pin a task")
         print("unpin <task>             ->        unpin a task")
@@ -502,14 +4206,38 @@ class PanCake:
         print("full-complete            ->        complete all the tasks")
         print("full-unfinish            ->        mark all the tasks as unfinished")
         print("history                  ->        show your commands history")
+        print("history search <text>    ->        show the commands containing some text")
         print("history-clear            ->        clear your commands history")
         print("removeall                ->        remove all the tasks")
         print("secrets                  ->        display the secret tasks")
         print("hide <task>              ->        add a task to the secret tasks")
         print("show <task>              ->        remove a task from the secret tasks")
         print("secrets-setpw            ->        change the password of the secret tasks")
+        print("unlock [<seconds>]       ->        use the secret tasks without the password for 15 minutes (or some seconds)")
+        print("lock                     ->        require the password again for the secret tasks")
         print("log <text>               ->        print some text")
         print("setlogs <status>         ->        change the logs status (0, 1, 2)")
+        print("timings                  ->        show the time spent in each command")
+        print("autosave [<s> [<n>]|off] ->        show the autosave, save every s seconds or n changes, or stop it")
+        print("stats                    ->        show the size of your lists and files, and the latency of each command")
+        print("profile on|off [<file>]  ->        profile the next commands, then show the slowest functions or write them in a .pstats file")
+        print("search <words>           ->        search the tasks by words (--secrets to include the secret tasks, --all to search every workspace)")
+        print("")
+        print("complete, unfinish, remove and pin also work on all the tasks matching a pattern:")
+        print("--match <glob>           ->        the tasks matching a glob (deploy-*)")
+        print("--regex <regex>          ->        the tasks matching a regex (^tmp)")
+        print("--prefix <prefix>        ->        the tasks starting with a prefix")
+        print("--tag <tag>              ->        the tasks with a tag")
+        print("--dry-run                ->        only display the matching tasks")
+        print("")
+        print("Options of tasks, trash, secrets and history:")
+        print("--limit <n>              ->        display at most n tasks")
+        print("--offset <n>             ->        skip the first n tasks")
+        print("--complete               ->        only the completed tasks (not for history)")
+        print("--unfinished             ->        only the unfinished tasks (not for history)")
+        print("--pinned                 ->        only the important tasks (tasks only)")
+        print("#<tag>                   ->        only the tasks with this tag (tasks only)")
+        print("--count                  ->        only display the amount of tasks")
 
     def license(self):
         """
@@ -559,9 +4287,25 @@ which displays absolutely everything.
     def exit(self):
         """
         Exit PanCake.
+        When not interactive, stop running the script: the session is saved
+        once at the end of it.
         """
-        confirm_save = input("All unsaved changes will be lost. Do you want to save before quitting? (Y/n) ")
-        if confirm_save == "Y":
+        if not self.interactive:
+            self.running = False
+            return
+        if self.autosave is not None:
+            self.log_message("Saving...")
+            autosave = self.autosave
+            error = self.stop_autosave()
+            if error is not None:
+                self.log_message(f"Your tasks couldn't be saved: {error}")
+                if input("All unsaved changes will be lost. Do you want to quit anyway? (Y/n) ") != "Y":
+                    self.start_autosave(autosave.interval, autosave.changes)
+                    return
+            self.workspaces.flush()
+            if error is None:
+                self.log_message("Saved.")
+        elif input("All unsaved changes will be lost. Do you want to save before quitting? (Y/n) ") == "Y":
             self.save_tasks()
         self.clear_screen()
         sys.exit(0)
@@ -573,91 +4317,680 @@ which displays absolutely everything.
         print(f"Welcome in PanCake version {self.version}!")
         print("Type 'help' to see a list of the available commands.")
 
+    def run(self):
+        """
+        Clear the screen, display the start messages and start the prompt.
+        """
+        self.clear_screen()
+        self.start()
+        self.enable_completion()
+        self.reminders = ReminderTimer(self.manager, self.notify_reminder)
+        self.reminders.start()
+        try:
+            self.prompt()
+        finally:
+            self.reminders.stop()
+            self.report_autosave()
+
+    def report_autosave(self):
+        """
+        Stop the autosave when PanCake ends, displaying whether its last
+        save has failed.
+        Return the message of the failed save, if any.
+        """
+        error = self.stop_autosave()
+        if error is not None:
+            print(f"Your tasks couldn't be saved: {error}", file=sys.stderr)
+        return error
+
+    def enable_completion(self):
+        """
+        Complete the command names and the task names with Tab, if readline
+        is available (it isn't on Windows).
+        """
+        try:
+            # Imported here so that PanCake starts faster when it isn't used
+            import readline
+        except ImportError:
+            return
+        readline.set_completer(self.complete_line)
+        # The whole line is completed, since task names have spaces
+        readline.set_completer_delims("")
+        if "libedit" in (readline.__doc__ or ""):
+            readline.parse_and_bind("bind ^I rl_complete")
+        else:
+            readline.parse_and_bind("tab: complete")
+
+    def complete_line(self, text: str, state: int):
+        """
+        Completer of readline: return the completion number :param state:
+        of the command line :param text:, or None when there is no more.
+        """
+        if state == 0:
+            self.completions = self.line_completions(text)
+        return self.completions[state] if state < len(self.completions) else None
+
+    def line_completions(self, line: str):
+        """
+        Return the completions of a command :param line: being typed: the
+        command names, or the names of the tasks for the commands of
+        TASK_COMPLETIONS.
+        """
+        if " " not in line:
+            start = bisect.bisect_left(self.command_names, line)
+            return [name + " " for name in itertools.takewhile(lambda name: name.startswith(line), self.command_names[start:])]
+        name, prefix = line.split(" ", 1)
+        registered = self.commands.get(name)
+        key = self.TASK_COMPLETIONS.get(registered.name) if registered is not None else None
+        if key is None:
+            return []
+        with self.manager.lock:
+            return [f"{name} {task}" for task in self.manager.complete_name(prefix, key)]
+
+    def resolve_task(self, task: list, key: str="tasks"):
+        """
+        Return the name of the task written as the words of :param task:.
+        With the fuzzy resolver on, a name which doesn't exist is replaced
+        by the closest task of the list :param key: (see
+        TaskManager.name_filter), once confirmed.
+        """
+        task = " ".join(task)
+        manager = self.manager
+        if not self.fuzzy or task in manager.store or manager.sealed_secret(task):
+            return task
+        closest = manager.closest_task(task, key)
+        if closest is None:
+            return task
+        if not self.interactive and not self.assume_yes:
+            self.log_message(f"'{task}' doesn't exist, did you mean '{closest}'?")
+            return task
+        if self.ask_confirmation(f"'{task}' doesn't exist, did you mean '{closest}' (Y/n)? ") == "Y":
+            return closest
+        return task
+
+    def set_fuzzy(self, argument: list=None):
+        """
+        Display whether the fuzzy resolver is on, or turn it on or off with
+        'fuzzy on|off'.
+        """
+        if argument is None:
+            print(f"The fuzzy resolver is {'on' if self.fuzzy else 'off'}.")
+            return
+        if argument not in (["on"], ["off"]):
+            raise PanCakeError("Usage: fuzzy [on|off]")
+        self.fuzzy = argument == ["on"]
+        self.log_message(f"The fuzzy resolver is {argument[0]}.", 2)
+
+    def notify_reminder(self, task: str, stamp: int):
+        """
+        Display the reminder of a :param task:, called by the reminder
+        timer while the prompt waits for a command.
+        """
+        due = self.manager.dates["due"].get(task)
+        print(f"\nReminder: '{task}'" + (f" is due {format_time(due)}." if due is not None else "."), flush=True)
+
+    def ask_password(self, message: str):
+        """
+        Ask for a password.
+        When not interactive, the password given to PanCake is used.
+        """
+        if self.interactive:
+            return input(message)
+        return self.password
+
+    def secret_password(self):
+        """
+        Return the password for the secret tasks, or None if they are
+        unlocked. When not interactive, the secret tasks are unlocked with
+        the password given to PanCake instead, so that it is only checked
+        once by a script.
+        """
+        if self.manager.unlocked():
+            return None
+        if not self.interactive:
+            self.manager.unlock(self.password)
+            return None
+        return self.ask_password("Enter password: ")
+
+    def unlock(self, argument: list=None):
+        """
+        Let the secret tasks be used without the password for some minutes.
+        :param argument: the amount of seconds, UNLOCK_TIMEOUT by default
+        """
+        timeout = UNLOCK_TIMEOUT
+        if argument:
+            try:
+                timeout = float(argument[0])
+            except ValueError:
+                raise PanCakeError("Invalid amount of seconds.")
+            if timeout <= 0:
+                raise PanCakeError("Invalid amount of seconds.")
+        self.manager.unlock(self.ask_password("Enter password: "), timeout)
+        self.log_message(f"The secret tasks are unlocked for {timeout:g} seconds.", 2)
+
+    def lock(self):
+        """
+        Require the password again to use the secret tasks.
+        """
+        self.manager.lock_secrets()
+        self.log_message("The secret tasks are locked.", 2)
+
+    def ask_confirmation(self, message: str):
+        """
+        Ask for a "Y/n" confirmation.
+        When not interactive, the confirmation is "Y" only if PanCake
+        has been told to assume yes.
+        """
+        if self.interactive:
+            return input(message)
+        return "Y" if self.assume_yes else "n"
+
     def prompt(self):
         """
         Start the main PanCake prompt.
         """
         while True:
             command = input("> ")
-            command_parts = command.split()
-            if not command_parts:
-                continue
+            self.execute(command)
+
+    def run_script(self, commands):
+        """
+        Run the commands of a script (an iterable of command lines) without
+        any prompt, then save the session once, even if the script is
+        stopped by an error. A command which fails is displayed, and the
+        script goes on.
+        Return the amount of commands run.
+        """
+        count = 0
+        start_time = time.perf_counter()
+        self.scripted = True
+        try:
+            for number, command in enumerate(commands, 1):
+                command = command.strip()
+                if not command or command.startswith("#"):
+                    continue
+                try:
+                    self.execute(command)
+                except Exception as error:
+                    self.log_message(f"Line {number}: '{command}' has failed ({type(error).__name__}: {error}).")
+                count += 1
+                if not self.running:
+                    break
+        finally:
+            self.scripted = False
+            elapsed = time.perf_counter() - start_time
+            self.running = False
+            self.save_tasks()
+        rate = count / elapsed if elapsed > 0 else float(count)
+        print(f"Processed {count} commands in {elapsed:.3f}s ({rate:.0f} commands/s).", file=sys.stderr)
+        return count
+
+    def execute(self, command: str):
+        """
+        Run a single command line and add it to the history.
+        """
+        command_parts = command.split()
+        if not command_parts:
+            return
+
+        name = command_parts[0]
+        argument = command_parts[1:] if len(command_parts) > 1 else None
 
-            name = command_parts[0]
-            argument = command_parts[1:] if len(command_parts) > 1 else None
-
-            if name == "help":
-                self.help()
-            elif name == "license":
-                self.license()
-            elif name == "exit":
-                self.exit()
-            elif name == "tasks":
-                self.display_tasks()
-            elif name == "trash":
-                self.display_trash()
-            elif name == "new" and argument:
-                self.add_task(argument)
-            elif name == "remove" and argument:
-                self.remove_task(argument)
-            elif name == "complete" and argument:
-                self.complete_task(argument)
-            elif name == "unfinish" and argument:
-                self.unfinish_task(argument)
-            elif name == "recover" and argument:
-                self.recover_task(argument)
-            elif name == "destroy" and argument:
-                self.destroy_task(argument)
-            elif name == "advancement":
-                self.advancement()
-            elif name == "save":
-                self.save_tasks()
-            elif name == "load":
-                self.load_tasks()
-            elif name == "clear":
-                self.clear_screen()
-            elif name == "pin" and argument:
-                self.pin_task(argument)
-            elif name == "unpin" and argument:
-                self.unpin_task(argument)
-            elif name == "updated":
-                self.updated()
-            elif name == "empty":
-                self.empty_trash()
-            elif name == "recoverall":
-                self.recover_all()
-            elif name == "full-complete":
-                self.full_complete()
-            elif name == "full-unfinish":
-                self.full_unfinish()
-            elif name == "history":
-                self.display_history()
-            elif name == "history-clear":
-                self.history_clear()
-            elif name == "removeall":
-                self.remove_all()
-            elif name == "secrets":
-                self.display_secrets()
-            elif name == "hide" and argument:
-                self.add_secret(argument)
-            elif name == "show" and argument:
-                self.remove_secret(argument)
-            elif name == "secrets-setpw":
-                self.set_secret_tasks_password()
-            elif name == "setlogs" and argument:
-                if argument[0] in {"0", "1", "2"}:
-                    self.logs_status = int(argument[0])
-                    if self.logs_status == 1 or self.logs_status == 2:
-                        print(f"Logs status updated to {self.logs_status}.")
+        # The command may change of workspace, it is kept in the history of
+        # the one it was run in
+        manager = self.manager
+        # The autosave thread waits for the command to be done
+        with manager.lock:
+            registered = self.find_command(name)
+            if registered is not None:
+                profiler = self.profiler
+                if profiler is None:
+                    registered.run(self, argument)
                 else:
-                    print("Invalid logs status. Please enter 0, 1, or 2.")
-            elif name == "log" and argument:
-                print(" ".join(argument))
+                    profiler.enable()
+                    try:
+                        registered.run(self, argument)
+                    finally:
+                        profiler.disable()
+
+            manager.add_history(command)
+            error = manager.history.new_error()
+            if error is not None:
+                self.log_message(f"{error} The commands are kept in memory until it can.")
+            # A script is committed once, when it is saved at the end
+            if not self.scripted:
+                manager.checkpoint()
+
+    def register_command(self, name: str, handler, arguments: str="none", aliases=()):
+        """
+        Register a new command.
+        :param name: the name of the command
+        :param handler: the name of the PanCake method running the command,
+        or a function called with the PanCake instance (and the argument)
+        :param arguments: "none", "optional" or "required"
+        :param aliases: other names of the command
+        """
+        registered = Command(name, handler, arguments)
+        self.commands[name] = registered
+        for alias in aliases:
+            self.commands[alias] = registered
+        self.command_names = sorted(self.commands)
+
+    def find_command(self, name: str):
+        """
+        Return the command called :param name:, or the only command starting
+        with :param name:. Display an error and return None if there is none.
+        """
+        registered = self.commands.get(name)
+        if registered is not None:
+            return registered
+        start = bisect.bisect_left(self.command_names, name)
+        matches = []
+        for command_name in self.command_names[start:]:
+            if not command_name.startswith(name):
+                break
+            if self.commands[command_name] not in matches:
+                matches.append(self.commands[command_name])
+        if len(matches) == 1:
+            return matches[0]
+        if matches:
+            self.log_message(f"Ambiguous command: {', '.join(match.name for match in matches)}.")
+        else:
+            self.log_message("Invalid command. Type 'help' to see the commands list.")
+        return None
+
+    def set_logs(self, argument: list):
+        """
+        Change the logs status.
+        """
+        if argument[0] not in {"0", "1", "2"}:
+            raise PanCakeError("Invalid logs status. Please enter 0, 1, or 2.")
+        self.manager.set_logs_status(int(argument[0]))
+        self.log_message(f"Logs status updated to {self.logs_status}.")
+
+    def log(self, text: list):
+        """
+        Print some :param text:.
+        """
+        print(" ".join(text))
+
+    def secrets_setpw(self, argument: list=None):
+        """
+        Change the password of the secret tasks. When not interactive, the
+        new password is given as argument.
+        """
+        self.set_secret_tasks_password(" ".join(argument) if argument and not self.interactive else None)
+
+    def display_timings(self):
+        """
+        Display how many times each command has been called and the time
+        spent in it, starting with the longest.
+        """
+        used = {registered for registered in self.commands.values() if registered.calls}
+        for registered in sorted(used, key=lambda registered: registered.time, reverse=True):
+            average = registered.time / registered.calls * 1000
+            print(f"{registered.name:<20} {registered.calls:>8} calls {registered.time:>10.3f}s total {average:>10.3f}ms average")
+
+    def display_stats(self):
+        """
+        Display the size of the lists, of the history and of the save file,
+        the duration of the last save and load, and the latency histogram
+        of each command run.
+        """
+        manager = self.manager
+        sizes = manager.list_sizes()
+        lines = [
+            f"Tasks: {sizes['tasks']}, important tasks: {sizes['important']}, secret tasks: {sizes['secrets']}, trash: {sizes['trash']}",
+            f"History: {len(manager.history)} commands ({len(manager.history.ring)} in memory)",
+            f"Save file: {manager.storage.size()} bytes ({', '.join(manager.storage.files())})",
+        ]
+        if manager.last_save is not None:
+            lines.append(f"Last save: {manager.last_save[0] * 1000:.3f}ms, {manager.last_save[1]} bytes written")
+        if manager.last_load is not None:
+            lines.append(f"Last load: {manager.last_load * 1000:.3f}ms")
+        used = sorted((registered for registered in set(self.commands.values()) if registered.calls), key=lambda registered: registered.time, reverse=True)
+        if used:
+            lines.append(f"{'command':<20} {'calls':>8} {'average':>10}   " + " ".join(f"{label:>7}" for label in LATENCY_LABELS))
+            for registered in used:
+                average = registered.time / registered.calls * 1000
+                lines.append(f"{registered.name:<20} {registered.calls:>8} {average:>8.3f}ms   " + " ".join(f"{count:>7}" for count in registered.histogram))
+        self.write_lines(lines)
+
+    def profile(self, argument: list):
+        """
+        Profile the next commands with 'profile on', until 'profile off',
+        which displays the functions where the most time has been spent,
+        or writes the profile in a .pstats file with 'profile off <file>'.
+        """
+        if argument == ["on"]:
+            if self.profiler is not None:
+                raise PanCakeError("The profiler is already on.")
+            # Imported here so that PanCake starts faster when it isn't used
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.log_message("Profiling the next commands, type 'profile off' to see the results.", 2)
+        elif argument[0] == "off":
+            if self.profiler is None:
+                raise PanCakeError("The profiler is not on.")
+            profiler = self.profiler
+            self.profiler = None
+            profiler.disable()
+            if len(argument) > 1:
+                path = " ".join(argument[1:])
+                try:
+                    profiler.dump_stats(path)
+                except OSError as error:
+                    raise PanCakeError(f"Can't write {path}: {error.strerror}. The profiler is off.")
+                self.log_message(f"Profile written to {path}.", 2)
             else:
-                if self.logs_status == 1 or self.logs_status == 2:
-                    print("Invalid command. Type 'help' to see the commands list.")
+                import pstats
+                pstats.Stats(profiler, stream=sys.stdout).sort_stats("cumulative").print_stats(20)
+        else:
+            raise PanCakeError("Usage: profile on|off [<file>]")
+
+    def set_autosave(self, argument: list=None):
+        """
+        Display the autosave metrics, start the autosave with
+        'autosave <seconds> [<changes>]' or stop it with 'autosave off'.
+        """
+        if argument is None:
+            self.display_autosave()
+        elif argument == ["off"]:
+            if self.autosave is None:
+                raise PanCakeError("The autosave is already off.")
+            error = self.stop_autosave()
+            if error is not None:
+                self.log_message(f"Your tasks couldn't be saved: {error}")
+            self.log_message("Autosave stopped.", 2)
+        else:
+            try:
+                interval = float(argument[0])
+                changes = int(argument[1]) if len(argument) > 1 else 100
+            except ValueError:
+                raise PanCakeError("Usage: autosave [<seconds> [<changes>]|off]")
+            if interval <= 0 or changes <= 0:
+                raise PanCakeError("The autosave interval and changes must be positive.")
+            error = self.stop_autosave()
+            if error is not None:
+                self.log_message(f"Your tasks couldn't be saved: {error}")
+            self.start_autosave(interval, changes)
+            self.log_message(f"Autosave every {interval:g}s or {changes} changes.", 2)
+
+    def display_autosave(self):
+        """
+        Display the autosave settings and metrics.
+        """
+        autosave = self.autosave
+        if autosave is None:
+            print("The autosave is off. Start it with 'autosave <seconds>'.")
+            return
+        print(f"Autosave every {autosave.interval:g}s or {autosave.changes} changes.")
+        average = autosave.flush_time / autosave.flushes * 1000 if autosave.flushes else 0.0
+        print(f"{autosave.flushes} saves, {average:.3f}ms average, {autosave.max_flush_time * 1000:.3f}ms max, {autosave.bytes_written} bytes written.")
+        print(f"{self.manager.changes - self.manager.saved_changes} unsaved changes.")
+        if autosave.error is not None:
+            print(f"The last save failed: {autosave.error}")
+
+    def start_autosave(self, interval: float, changes: int=100):
+        """
+        Save the session in the background every :param interval: seconds
+        or :param changes: changes, and once more when PanCake is exited or
+        terminated.
+        """
+        self.autosave = Autosave(self.manager, interval, changes)
+        self.autosave.start()
+        # Signals can only be handled by the main thread
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self.terminate)
+
+    def stop_autosave(self):
+        """
+        Stop the autosave, saving the session if it is dirty.
+        Return the message of the last save if it has failed, None
+        otherwise.
+        """
+        if self.autosave is None:
+            return None
+        autosave = self.autosave
+        self.autosave = None
+        return autosave.stop()
+
+    def terminate(self, signum, frame):
+        """
+        Exit on SIGTERM, so that the autosave saves the session one last time.
+        """
+        raise SystemExit(0)
+
+class Daemon:
+    """
+    PanCake daemon: the session stays in memory and the commands are
+    received on a local Unix socket, so a command run from the shell costs
+    a connection instead of a load and a save.
+    Each connection sends one request, a JSON line {"command": ...,
+    "password": ..., "yes": ...}, and receives one JSON line {"output": ...}
+    with what the command has displayed. Connections are served by a
+    thread each, but the commands are run one at a time, in the order
+    they arrive.
+    :param pancake: the PanCake running the commands (not interactive)
+    :param path: the path of the socket
+    """
+    def __init__(self, pancake: PanCake, path: str):
+        self.pancake = pancake
+        self.path = path
+        pancake.remote = True
+
+    def run(self, command: str, password: str="", assume_yes: bool=False):
+        """
+        Run a :param command: and return what it has displayed.
+        """
+        import io
+        import contextlib
+
+        output = io.StringIO()
+        with self.pancake.manager.lock:
+            self.pancake.password = password
+            self.pancake.assume_yes = assume_yes
+            try:
+                with contextlib.redirect_stdout(output):
+                    self.pancake.execute(command)
+            finally:
+                # Each request gives its own password
+                self.pancake.manager.lock_secrets()
+        return output.getvalue()
 
-            self.history.append(command)
+    def serve(self):
+        """
+        Serve the clients until PanCake is terminated, then remove the socket.
+        """
+        import socketserver
+
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                try:
+                    request = json.loads(self.rfile.readline())
+                    command = request["command"]
+                    password = request.get("password", "")
+                    assume_yes = request.get("yes", False)
+                except (ValueError, KeyError, TypeError, AttributeError) as error:
+                    response = {"error": f"Invalid request: {error}"}
+                except OSError as error:
+                    response = {"error": str(error)}
+                else:
+                    try:
+                        response = {"output": daemon.run(command, password, assume_yes)}
+                    except Exception as error:
+                        # The client always gets a response, the daemon keeps the traceback
+                        import traceback
+
+                        traceback.print_exc()
+                        response = {"error": str(error)}
+                try:
+                    self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+                except OSError:
+                    pass
+
+        if os.path.exists(self.path):
+            if listening(self.path):
+                raise PanCakeError(f"A PanCake daemon is already running on {self.path}.")
+            # Left behind by a daemon which has been killed
+            os.unlink(self.path)
+        server = socketserver.ThreadingUnixStreamServer(self.path, Handler)
+        server.daemon_threads = True
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+            os.unlink(self.path)
+
+def listening(path: str):
+    """
+    Whether a daemon is listening on the socket :param path:.
+    """
+    import socket
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        try:
+            connection.connect(path)
+        except (FileNotFoundError, ConnectionRefusedError):
+            return False
+    return True
+
+def send_command(path: str, request: dict):
+    """
+    Send a :param request: to the daemon listening on :param path: and
+    return its response, or None if no daemon is listening.
+    """
+    import socket
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.connect(path)
+            connection.sendall(json.dumps(request).encode("utf-8") + b"\n")
+            connection.shutdown(socket.SHUT_WR)
+            with connection.makefile('rb') as response:
+                return json.loads(response.readline())
+    except (FileNotFoundError, ConnectionRefusedError):
+        return None
+
+def main(argv=None):
+    """
+    Parse the command line and run PanCake, either with the interactive
+    prompt, in batch mode with a script, as a daemon, or as the client of a
+    daemon running a single command.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="pancake", description="A text-based easy to use open-source task manager.")
+    parser.add_argument("--script", metavar="FILE", help="run the commands of FILE ('-' for stdin) without prompting, then save once")
+    parser.add_argument("--save-file", metavar="FILE", help="use FILE as the save file")
+    parser.add_argument("--password", default="", help="secret tasks password used by the script")
+    parser.add_argument("-y", "--yes", action="store_true", help="answer 'Y' to every confirmation of the script")
+    parser.add_argument("--logs", type=int, choices=(0, 1, 2), help="logs status used by the script")
+    parser.add_argument("--storage", choices=sorted(STORAGES), default="json", help="how the save file is written (json by default)")
+    parser.add_argument("--history-size", type=int, default=HISTORY_SIZE, help=f"commands of the history kept in memory ({HISTORY_SIZE} by default)")
+    parser.add_argument("--fuzzy", action="store_true", help="suggest the closest task when a task name doesn't exist")
+    parser.add_argument("--workspace-cache", type=int, default=WORKSPACE_CACHE_SIZE // (1024 * 1024), metavar="MB", help=f"memory the workspaces left recently may keep loaded ({WORKSPACE_CACHE_SIZE // (1024 * 1024)} MB by default)")
+    parser.add_argument("--autosave", type=float, metavar="SECONDS", help="load the save file, then save it in the background every SECONDS seconds")
+    parser.add_argument("--autosave-changes", type=int, default=100, metavar="N", help="with --autosave, also save as soon as N changes are made (100 by default)")
+    parser.add_argument("--daemon", action="store_true", help="keep the session in memory and run the commands sent by 'pancake <command>'")
+    parser.add_argument("--socket", metavar="PATH", help="socket of the daemon (the save file followed by .sock by default)")
+    parser.add_argument("command", nargs=argparse.REMAINDER, help="a command to send to the daemon (or to run at once if there is no daemon)")
+    args = parser.parse_args(argv)
+    socket_path = args.socket or (args.save_file or default_save_file()) + ".sock"
+
+    if args.daemon:
+        return run_daemon(args, socket_path)
+    if args.command:
+        if args.script is not None:
+            parser.error("a command can't be given with --script")
+        response = send_command(socket_path, {"command": " ".join(args.command), "password": args.password, "yes": args.yes})
+        if response is None:
+            # No daemon: the command is run as a script of one line
+            args.script = [" ".join(args.command)]
+        elif "error" in response:
+            print(response["error"], file=sys.stderr)
+            sys.exit(1)
+        else:
+            print(response["output"], end="")
+            return None
+
+    if args.script is None:
+        pancake = PanCake(save_file=args.save_file, storage=args.storage, history_size=args.history_size, workspace_cache=args.workspace_cache * 1024 * 1024, fuzzy=args.fuzzy)
+        if args.autosave is not None:
+            load_for_autosave(pancake, args)
+        pancake.run()
+        return pancake
+
+    pancake = PanCake(save_file=args.save_file, interactive=False, password=args.password, assume_yes=args.yes, storage=args.storage, history_size=args.history_size, workspace_cache=args.workspace_cache * 1024 * 1024, fuzzy=args.fuzzy)
+    if args.logs is not None:
+        pancake.logs_status = args.logs
+    try:
+        pancake.load_tasks()
+    except SaveNotFound as error:
+        pancake.log_message(str(error))
+    except PanCakeError as error:
+        # The script is saved at the end, over the save file which can't be read
+        print(f"{error} The script hasn't been run.", file=sys.stderr)
+        sys.exit(1)
+    if args.autosave is not None:
+        pancake.start_autosave(args.autosave, args.autosave_changes)
+    if args.logs is not None:
+        pancake.logs_status = args.logs
+    try:
+        if isinstance(args.script, list):
+            pancake.run_script(args.script)
+        elif args.script == "-":
+            pancake.run_script(sys.stdin)
+        else:
+            with open(args.script, 'r') as script:
+                pancake.run_script(script)
+    finally:
+        pancake.report_autosave()
+    return pancake
+
+def run_daemon(args, socket_path: str):
+    """
+    Load the save file and serve the commands sent on :param socket_path:
+    until PanCake is terminated. The session is autosaved (every second
+    unless --autosave is given), and saved one last time when terminated.
+    """
+    if listening(socket_path):
+        print(f"A PanCake daemon is already running on {socket_path}.", file=sys.stderr)
+        sys.exit(1)
+    pancake = PanCake(save_file=args.save_file, interactive=False, storage=args.storage, history_size=args.history_size, workspace_cache=args.workspace_cache * 1024 * 1024, fuzzy=args.fuzzy)
+    if args.autosave is None:
+        args.autosave = 1.0
+    load_for_autosave(pancake, args)
+    if pancake.autosave is None:
+        sys.exit(1)
+    signal.signal(signal.SIGINT, pancake.terminate)
+    print(f"PanCake daemon listening on {socket_path}", file=sys.stderr)
+    try:
+        Daemon(pancake, socket_path).serve()
+    except PanCakeError as error:
+        print(error, file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if pancake.report_autosave() is not None:
+            sys.exit(1)
+    return pancake
+
+def load_for_autosave(pancake: PanCake, args):
+    """
+    Load the save file and start the autosave. If the save file exists but
+    can't be loaded, the autosave isn't started, so it never overwrites it.
+    """
+    try:
+        pancake.load_tasks()
+    except SaveNotFound as error:
+        pancake.log_message(str(error))
+    except PanCakeError as error:
+        pancake.log_message(f"{error} The autosave is off.")
+        return
+    pancake.start_autosave(args.autosave, args.autosave_changes)
 
 # Run PanCake
-pancake = PanCake()
+if __name__ == "__main__":
+    main()
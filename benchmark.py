@@ -0,0 +1,650 @@
+#!/usr/bin/env python3
+
+"""
+PanCake benchmarks.
+Usage: python3 benchmark.py memory [sizes...]
+       python3 benchmark.py import [runs]
+       python3 benchmark.py listing [sizes...]
+       python3 benchmark.py search [sizes...]
+       python3 benchmark.py startup [sizes...]
+       python3 benchmark.py shared [workers] [tasks]
+       python3 benchmark.py daemon [sizes...]
+       python3 benchmark.py transfer [sizes...]
+       python3 benchmark.py completion [sizes...]
+       python3 benchmark.py suite [sizes...] [--output FILE] [--compare FILE] [--threshold RATIO]
+"""
+
+import os
+import sys
+import json
+import time
+import statistics
+import subprocess
+import random
+import threading
+import contextlib
+import tracemalloc
+import tempfile
+import multiprocessing
+import platform
+import resource
+
+from PanCake import TaskManager, PanCake, Status, send_command
+
+def synthetic_save(size: int):
+    """
+    Return the lists of a save file with :param size: tasks: 80% user tasks
+    (a third of them complete), 5% important tasks, 5% secret tasks and
+    10% in the trash.
+    """
+    data = {"tasks": {}, "important": {}, "secrets": {}, "trash": {}}
+    for i in range(size):
+        task = f"task number {i}"
+        status = "Complete" if i % 3 == 0 else "Unfinished"
+        kind = i % 20
+        if kind == 0:
+            data["important"][task] = status
+        elif kind == 1:
+            data["secrets"][task] = status
+        elif kind < 4:
+            data["trash"][task] = {"status": status, "origin": "tasks"}
+        else:
+            data["tasks"][task] = status
+    return data
+
+def measure(build):
+    """
+    Return the amount of bytes allocated by :param build: and still in use.
+    """
+    tracemalloc.start()
+    result = build()
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return used
+
+def previous_layout(data: dict):
+    """
+    Build the task lists as they were kept before the task store: one dict
+    per list, and a dict of previous status and origin for each removed task.
+    """
+    return (
+        dict(data["tasks"]),
+        dict(data["important"]),
+        dict(data["secrets"]),
+        {task: dict(removed) for task, removed in data["trash"].items()},
+    )
+
+def task_store(data: dict):
+    """
+    Build the task store of a PanCake session.
+    """
+    manager = TaskManager(save_file="benchmark.json")
+    manager.store_from_save(data)
+    return manager.store
+
+def memory(sizes):
+    """
+    Compare the memory used by each task with the previous layout and with
+    the task store. Task names are shared by both and not counted.
+    """
+    print(f"{'tasks':>10} {'previous (B/task)':>18} {'store (B/task)':>15}")
+    for size in sizes:
+        data = synthetic_save(size)
+        previous = measure(lambda: previous_layout(data))
+        store = measure(lambda: task_store(data))
+        print(f"{size:>10} {previous / size:>18.1f} {store / size:>15.1f}")
+
+# Run in a new interpreter for each run, so that nothing is already imported
+IMPORT_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import PanCake
+imported = time.perf_counter()
+manager = PanCake.TaskManager()
+pancake = PanCake.PanCake(manager=manager)
+constructed = time.perf_counter()
+print(json.dumps([imported - start, constructed - imported]))
+"""
+
+def import_time(runs):
+    """
+    Measure the time needed to import PanCake and to construct a task
+    manager and its prompt, without loading any save file.
+    """
+    runs = runs[0] if runs else 20
+    directory = os.path.dirname(os.path.realpath(__file__))
+    imports = []
+    constructions = []
+    for i in range(runs):
+        output = subprocess.run([sys.executable, "-c", IMPORT_SCRIPT], cwd=directory, capture_output=True, text=True, check=True).stdout
+        imported, constructed = json.loads(output)
+        imports.append(imported * 1000)
+        constructions.append(constructed * 1000)
+    print(f"import:       {statistics.median(imports):.2f}ms (median of {runs} runs)")
+    print(f"construction: {statistics.median(constructions):.3f}ms (median of {runs} runs)")
+
+def print_each_line(manager: TaskManager):
+    """
+    Display the tasks as before the buffered listings: one print per line.
+    """
+    important_tasks = list(manager.view("important"))
+    if important_tasks:
+        print("--> IMPORTANT TASKS")
+        for i, (task, status) in enumerate(important_tasks, start=1):
+            print(f"* {i}. {task} - {status}")
+    print("--------------------------------------")
+    for i, (task, status) in enumerate(manager.view("tasks"), start=1):
+        print(f"{i}. {task} - {status}")
+
+def listing(sizes):
+    """
+    Compare the time needed to display all the tasks on a terminal (a
+    pseudo-terminal read by another thread) with one print per line and
+    with the buffered listing of the tasks command.
+    """
+    import pty
+
+    print(f"{'tasks':>10} {'print per line':>15} {'buffered':>10} {'speedup':>8}")
+    for size in sizes:
+        manager = TaskManager(save_file="benchmark.json")
+        manager.store_from_save(synthetic_save(size))
+        pancake = PanCake(manager=manager)
+
+        master, slave = pty.openpty()
+
+        def drain():
+            try:
+                while os.read(master, 65536):
+                    pass
+            except OSError:
+                pass
+
+        reader = threading.Thread(target=drain, daemon=True)
+        reader.start()
+        # Line buffered, as the standard output on a terminal
+        terminal = open(slave, 'w', buffering=1)
+        with contextlib.redirect_stdout(terminal):
+            start = time.perf_counter()
+            print_each_line(manager)
+            terminal.flush()
+            per_line = time.perf_counter() - start
+            start = time.perf_counter()
+            pancake.display_tasks()
+            buffered = time.perf_counter() - start
+        terminal.close()
+        os.close(master)
+        reader.join()
+        print(f"{size:>10} {per_line:>14.3f}s {buffered:>9.3f}s {per_line / buffered:>7.1f}x")
+
+# Words used to build task names for the search benchmark
+VOCABULARY = [
+    "deploy", "fix", "write", "review", "update", "test", "release", "clean", "plan", "call",
+    "api", "server", "docs", "bug", "client", "database", "backup", "report", "meeting", "design",
+    "infra", "login", "cache", "queue", "billing", "mobile", "web", "search", "index", "metrics",
+]
+
+def search(sizes):
+    """
+    Measure the time needed to build the word index and to run searches of
+    three words (two common words and a rare one) on tasks named from a
+    small vocabulary and a number, then of a single common word: the first
+    search of a word ranks its tasks, the next ones only read the first.
+    """
+    generator = random.Random(42)
+    print(f"{'tasks':>10} {'index build':>12} {'query (median)':>15} {'query (max)':>12} {'common word (first)':>20} {'common word (median)':>21}")
+    for size in sizes:
+        manager = TaskManager(save_file="benchmark.json")
+        for i in range(size):
+            manager.store[f"{' '.join(generator.sample(VOCABULARY, 3))} {i}"] = 0
+        start = time.perf_counter()
+        manager.search(["warmup"])
+        build = time.perf_counter() - start
+        durations = []
+        for i in range(200):
+            terms = generator.sample(VOCABULARY, 2) + [str(generator.randrange(size))]
+            start = time.perf_counter()
+            manager.search(terms)
+            durations.append(time.perf_counter() - start)
+        word = generator.choice(VOCABULARY)
+        start = time.perf_counter()
+        manager.search([word])
+        first = time.perf_counter() - start
+        common = []
+        for i in range(200):
+            start = time.perf_counter()
+            manager.search([word])
+            common.append(time.perf_counter() - start)
+        print(f"{size:>10} {build:>11.2f}s {statistics.median(durations) * 1000:>13.3f}ms {max(durations) * 1000:>10.3f}ms {first * 1000:>18.1f}ms {statistics.median(common) * 1000:>19.3f}ms")
+
+def completion(sizes):
+    """
+    Measure the time needed to build the name trie, to complete prefixes of
+    1 to 6 characters of task names (as the Tab key does) and to find the
+    task closest to a name with a typo, on tasks named like in search.
+    """
+    generator = random.Random(42)
+    print(f"{'tasks':>10} {'trie build':>11} {'complete (median)':>18} {'complete (max)':>15} {'fuzzy (median)':>15} {'fuzzy (max)':>12}")
+    for size in sizes:
+        pancake = PanCake(manager=TaskManager(save_file="benchmark.json"), interactive=False)
+        manager = pancake.manager
+        for i in range(size):
+            manager.store[f"{' '.join(generator.sample(VOCABULARY, 3))} {i}"] = 0
+        names = list(manager.store)
+        start = time.perf_counter()
+        manager.names()
+        build = time.perf_counter() - start
+        completions = []
+        for i in range(200):
+            line = "complete " + generator.choice(names)[:generator.randint(1, 6)]
+            start = time.perf_counter()
+            pancake.line_completions(line)
+            completions.append(time.perf_counter() - start)
+        fuzzy = []
+        for i in range(50):
+            name = list(generator.choice(names))
+            name[generator.randrange(len(name))] = "x"
+            start = time.perf_counter()
+            manager.closest_task("".join(name))
+            fuzzy.append(time.perf_counter() - start)
+        print(f"{size:>10} {build:>10.2f}s {statistics.median(completions) * 1000:>16.3f}ms {max(completions) * 1000:>13.3f}ms {statistics.median(fuzzy) * 1000:>13.3f}ms {max(fuzzy) * 1000:>10.3f}ms")
+
+# Run in a new interpreter for each run, so that the startup is cold
+STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import PanCake
+manager = PanCake.TaskManager(save_file=sys.argv[1], storage=sys.argv[2])
+manager.load_tasks()
+loaded = time.perf_counter()
+if sys.argv[2] == "binary":
+    manager.storage.header()
+print(json.dumps([loaded - start, time.perf_counter() - loaded]))
+"""
+
+def startup(sizes):
+    """
+    Compare the time needed to start PanCake (import and load) with the
+    JSON save file and with the binary snapshot, and the time needed to
+    read only the counters of the binary snapshot.
+    """
+    runs = 5
+    directory = os.path.dirname(os.path.realpath(__file__))
+    print(f"{'tasks':>10} {'json':>9} {'binary':>9} {'speedup':>8} {'header':>9} {'json size':>10} {'binary size':>12}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as temporary:
+            save_file = os.path.join(temporary, "saved_tasks.json")
+            manager = TaskManager(save_file=save_file)
+            manager.store_from_save(synthetic_save(size))
+            manager.save_tasks()
+            TaskManager(save_file=save_file, storage="binary").storage.save(manager)
+            results = {}
+            for storage in ("json", "binary"):
+                runs_results = []
+                for i in range(runs):
+                    output = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT, save_file, storage], cwd=directory, capture_output=True, text=True, check=True).stdout
+                    runs_results.append(json.loads(output))
+                results[storage] = [statistics.median(result) * 1000 for result in zip(*runs_results)]
+            json_size = os.path.getsize(save_file)
+            binary_size = os.path.getsize(os.path.join(temporary, "saved_tasks.pancake"))
+        json_time, binary_time, header_time = results["json"][0], results["binary"][0], results["binary"][1]
+        print(f"{size:>10} {json_time:>7.1f}ms {binary_time:>7.1f}ms {json_time / binary_time:>7.1f}x {header_time:>7.3f}ms {json_size / 1e6:>8.1f}MB {binary_size / 1e6:>10.1f}MB")
+
+def shared_worker(save_file: str, worker: int, workers: int, tasks: int):
+    """
+    Change one shared save file from a PanCake process: add :param tasks:
+    tasks (completing every other one), complete the shared tasks of this
+    worker, and save after each change. Every few changes, the changes of
+    the other workers are picked up.
+    Return the amount of saves.
+    """
+    manager = TaskManager(save_file=save_file, storage="shared")
+    manager.load_tasks()
+    saves = 0
+    for i in range(tasks):
+        task = f"worker {worker} task {i}"
+        manager.add_task(task)
+        if i % 2:
+            manager.complete_task(task)
+        manager.complete_task(f"shared task {i * workers + worker}")
+        if i % 5 == 0:
+            manager.refresh()
+        manager.save_tasks()
+        saves += 1
+    return saves
+
+def shared(arguments):
+    """
+    Stress test of the shared storage: many processes change the same save
+    file at once, then the file must hold every change made by each of them.
+    """
+    workers = arguments[0] if arguments else 8
+    tasks = arguments[1] if len(arguments) > 1 else 200
+    with tempfile.TemporaryDirectory() as temporary:
+        save_file = os.path.join(temporary, "saved_tasks.json")
+        manager = TaskManager(save_file=save_file, storage="shared")
+        for i in range(workers * tasks):
+            manager.add_task(f"shared task {i}")
+        manager.save_tasks()
+
+        start = time.perf_counter()
+        with multiprocessing.Pool(workers) as pool:
+            saves = sum(pool.starmap(shared_worker, [(save_file, worker, workers, tasks) for worker in range(workers)]))
+        elapsed = time.perf_counter() - start
+
+        manager = TaskManager(save_file=save_file, storage="shared")
+        manager.load_tasks()
+        lost = []
+        for worker in range(workers):
+            for i in range(tasks):
+                expected = Status.COMPLETE if i % 2 else Status.UNFINISHED
+                if manager.store.get(f"worker {worker} task {i}") != expected:
+                    lost.append(f"worker {worker} task {i}")
+        lost.extend(task for task, flags in manager.store.items() if task.startswith("shared") and flags != Status.COMPLETE)
+        complete = sum(1 for flags in manager.store.values() if flags & Status.COMPLETE)
+        print(f"{workers} workers, {saves} saves in {elapsed:.2f}s ({saves / elapsed:.0f} saves/s)")
+        print(f"tasks: {len(manager.store)}, lost updates: {len(lost)}, counters: {manager.advancement()} (expected {(complete, len(manager.store) - complete)})")
+        assert not lost, f"lost updates: {lost[:10]}"
+        assert manager.advancement() == (complete, len(manager.store) - complete), "the counters have drifted"
+
+        # A session which has never loaded the save file merges with it too
+        newcomer = TaskManager(save_file=save_file, storage="shared")
+        newcomer.add_task("newcomer task")
+        newcomer.save_tasks()
+        merged = TaskManager(save_file=save_file, storage="shared")
+        merged.load_tasks()
+        assert merged.store == dict(manager.store, **{"newcomer task": Status.UNFINISHED}), "the merge of a session never loaded has lost updates"
+        print("merge of a session never loaded: ok")
+
+def daemon(sizes):
+    """
+    Compare the time needed to add a task from the shell without daemon
+    (a full load and save) and with a daemon (a socket round trip), and
+    measure the round trip alone, without starting an interpreter.
+    """
+    runs = 20
+    pancake = os.path.join(os.path.dirname(os.path.realpath(__file__)), "PanCake.py")
+    print(f"{'tasks':>10} {'no daemon':>10} {'daemon':>9} {'speedup':>8} {'round trip':>11}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as temporary:
+            save_file = os.path.join(temporary, "saved_tasks.json")
+            manager = TaskManager(save_file=save_file)
+            manager.store_from_save(synthetic_save(size))
+            manager.save_tasks()
+
+            def command_time(i):
+                start = time.perf_counter()
+                subprocess.run([sys.executable, pancake, "--save-file", save_file, "new", f"shell task {i}"], capture_output=True, check=True)
+                return time.perf_counter() - start
+
+            without = statistics.median(command_time(i) for i in range(runs))
+            server = subprocess.Popen([sys.executable, pancake, "--daemon", "--save-file", save_file], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            # The daemon is ready once it has loaded the save file
+            server.stderr.readline()
+            try:
+                with_daemon = statistics.median(command_time(runs + i) for i in range(runs))
+                round_trips = []
+                for i in range(runs * 10):
+                    start = time.perf_counter()
+                    send_command(save_file + ".sock", {"command": f"new socket task {i}"})
+                    round_trips.append(time.perf_counter() - start)
+                round_trip = statistics.median(round_trips)
+            finally:
+                server.terminate()
+                server.wait()
+        print(f"{size:>10} {without * 1000:>8.1f}ms {with_daemon * 1000:>7.1f}ms {without / with_daemon:>7.1f}x {round_trip * 1000:>9.2f}ms")
+
+def transfer(sizes):
+    """
+    Measure the import and the export of JSON Lines files of each size, and
+    the memory used by the import besides the tasks it adds (the peak over
+    what is left once it is done), which only grows with the file when the
+    dicts of the task store are resized, not with the rows read.
+    """
+    print(f"{'rows':>10} {'import':>9} {'rows/s':>9} {'export':>9} {'rows/s':>9} {'import overhead':>16}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as temporary:
+            rows_file = os.path.join(temporary, "tasks.jsonl")
+            with open(rows_file, 'w') as file:
+                for i in range(size):
+                    row = {"name": f"task {i}", "status": "Complete" if i % 3 == 0 else "Unfinished", "pinned": i % 20 == 0}
+                    if i % 10 == 0:
+                        row["tags"] = [f"tag{i % 7}"]
+                    file.write(json.dumps(row) + "\n")
+
+            def run(command: str):
+                save_file = os.path.join(temporary, "saved_tasks.json")
+                pancake = PanCake(save_file=save_file, interactive=False, manager=TaskManager(save_file=save_file))
+                with contextlib.redirect_stdout(open(os.devnull, 'w')):
+                    pancake.execute(f"import {rows_file}")
+                    start = time.perf_counter()
+                    if command:
+                        pancake.execute(command)
+                return time.perf_counter() - start
+
+            start = time.perf_counter()
+            export = run(f"export {os.path.join(temporary, 'export.jsonl')}")
+            imported = time.perf_counter() - start - export
+            tracemalloc.start()
+            run(None)
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        print(f"{size:>10} {imported:>8.2f}s {size / imported:>9.0f} {export:>8.2f}s {size / export:>9.0f} {(peak - current) / 1024 / 1024:>14.1f}MB")
+
+# Commands of the suite workload and their weights
+WORKLOAD = [
+    ("new", 30), ("complete", 15), ("unfinish", 5), ("remove", 10), ("recover", 5),
+    ("pin", 5), ("unpin", 3), ("search", 10), ("tasks --limit 20", 7), ("advancement", 5),
+    ("history --limit 20", 5),
+]
+
+def workload_commands(generator: random.Random, size: int, operations: int):
+    """
+    Return :param operations: command lines drawn from the weighted
+    workload, on the tasks of a synthetic save of :param size: tasks.
+    """
+    names = [name for name, weight in WORKLOAD]
+    weights = [weight for name, weight in WORKLOAD]
+    commands = []
+    for i, name in enumerate(generator.choices(names, weights, k=operations)):
+        if name == "new":
+            commands.append(f"new workload task {i}")
+        elif name == "search":
+            commands.append(f"search task {generator.randrange(size)}")
+        elif name in ("complete", "unfinish", "remove", "recover", "pin", "unpin"):
+            commands.append(f"{name} task number {generator.randrange(size)}")
+        else:
+            commands.append(name)
+    return commands
+
+def suite_scale(size: int, storage: str, operations: int, seed: int):
+    """
+    Run the suite at one scale, in its own process so that its peak memory
+    is its own: build a synthetic session of :param size: tasks with a
+    history as long, save and load it, then run the workload through the
+    command handlers and display all the tasks. Saving, loading and
+    displaying are measured several times, and the median is kept.
+    Return the results as a dict.
+    """
+    repeats = 5
+    generator = random.Random(seed)
+    with tempfile.TemporaryDirectory() as temporary:
+        save_file = os.path.join(temporary, "saved_tasks.json")
+        manager = TaskManager(save_file=save_file, storage=storage)
+        manager.store_from_save(synthetic_save(size))
+        for i in range(size):
+            manager.add_history(f"new history command {i}")
+        durations = []
+        for i in range(repeats):
+            start = time.perf_counter()
+            manager.save_tasks()
+            durations.append(time.perf_counter() - start)
+        save_time = statistics.median(durations)
+        file_size = sum(os.path.getsize(os.path.join(temporary, name)) for name in os.listdir(temporary))
+
+        durations = []
+        for i in range(repeats):
+            manager = TaskManager(save_file=save_file, storage=storage)
+            start = time.perf_counter()
+            manager.load_tasks()
+            durations.append(time.perf_counter() - start)
+        load_time = statistics.median(durations)
+
+        pancake = PanCake(manager=manager, interactive=False)
+        latencies = {}
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            total_start = time.perf_counter()
+            for command in workload_commands(generator, size, operations):
+                start = time.perf_counter()
+                pancake.execute(command)
+                latencies.setdefault(command.split()[0], []).append(time.perf_counter() - start)
+            total = time.perf_counter() - total_start
+            durations = []
+            for i in range(repeats):
+                start = time.perf_counter()
+                pancake.display_tasks()
+                durations.append(time.perf_counter() - start)
+            listing_time = statistics.median(durations)
+
+    commands = {}
+    for name, durations in latencies.items():
+        durations.sort()
+        commands[name] = {
+            "count": len(durations),
+            "p50": durations[len(durations) // 2],
+            "p99": durations[min(len(durations) - 1, len(durations) * 99 // 100)],
+        }
+    return {
+        "save": save_time,
+        "load": load_time,
+        "listing": listing_time,
+        "file_size": file_size,
+        # Kilobytes on Linux
+        "peak_memory": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        "throughput": operations / total,
+        "commands": commands,
+    }
+
+def regressions(previous: dict, current: dict, threshold: float):
+    """
+    Compare the results of two suite runs and return a description of each
+    measure which is worse by more than :param threshold: (0.25 for 25%).
+    A duration must also be worse by a minimum amount of time, below which
+    the differences are noise: 2ms for saving, loading and displaying,
+    0.05ms for the median latency of a command, and 1ms for its p99.
+    """
+    found = []
+
+    def check(label, before, after, minimum=0.0, lower_is_better=True):
+        if before is None or after is None:
+            return
+        if lower_is_better and after > before * (1 + threshold) and after - before > minimum:
+            found.append(f"{label}: {before:.6g} -> {after:.6g}")
+        elif not lower_is_better and after < before / (1 + threshold):
+            found.append(f"{label}: {before:.6g} -> {after:.6g}")
+
+    for size, result in current["results"].items():
+        before = previous["results"].get(size)
+        if before is None:
+            continue
+        for measure in ("save", "load", "listing"):
+            check(f"{size} tasks {measure}", before.get(measure), result[measure], 0.002)
+        check(f"{size} tasks throughput", before.get("throughput"), result["throughput"], lower_is_better=False)
+        for name, latency in result["commands"].items():
+            previous_latency = before.get("commands", {}).get(name, {})
+            check(f"{size} tasks {name} p50", previous_latency.get("p50"), latency["p50"], 0.00005)
+            check(f"{size} tasks {name} p99", previous_latency.get("p99"), latency["p99"], 0.001)
+    return found
+
+def suite(arguments):
+    """
+    Benchmark suite: run a reproducible workload of commands at several
+    scales, and write throughput, latency percentiles of each command,
+    save and load time, file size and peak memory as JSON. With --compare,
+    the results are checked against a previous run, and the regressions
+    make the suite fail.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="benchmark.py suite")
+    parser.add_argument("sizes", type=int, nargs="*", default=[1000, 10000, 100000])
+    parser.add_argument("--storage", default="json")
+    parser.add_argument("--operations", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", metavar="FILE")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    args = parser.parse_args(arguments)
+
+    results = {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "storage": args.storage,
+            "operations": args.operations,
+            "seed": args.seed,
+        },
+        "results": {},
+    }
+    print(f"{'tasks':>10} {'save':>9} {'load':>9} {'listing':>9} {'file':>9} {'memory':>9} {'commands/s':>11}")
+    for size in args.sizes:
+        # A new process for each scale, so that the peak memory is its own
+        with multiprocessing.get_context("spawn").Pool(1) as pool:
+            result = pool.apply(suite_scale, (size, args.storage, args.operations, args.seed))
+        results["results"][str(size)] = result
+        print(f"{size:>10} {result['save'] * 1000:>7.1f}ms {result['load'] * 1000:>7.1f}ms {result['listing'] * 1000:>7.1f}ms "
+              f"{result['file_size'] / 1e6:>7.1f}MB {result['peak_memory'] / 1e6:>7.1f}MB {result['throughput']:>11.0f}")
+        for name, latency in sorted(result["commands"].items()):
+            print(f"{'':>10} {name:<12} p50 {latency['p50'] * 1000:>8.3f}ms  p99 {latency['p99'] * 1000:>8.3f}ms  ({latency['count']} calls)")
+
+    with open(args.output, 'w') as output:
+        json.dump(results, output, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r') as previous_file:
+            previous = json.load(previous_file)
+        found = regressions(previous, results, args.threshold)
+        for regression in found:
+            print(f"REGRESSION {regression}")
+        if found:
+            sys.exit(1)
+        print(f"No regression over {args.threshold:.0%} compared to {args.compare}.")
+
+BENCHMARKS = {
+    "memory": memory,
+    "import": import_time,
+    "listing": listing,
+    "search": search,
+    "startup": startup,
+    "shared": shared,
+    "daemon": daemon,
+    "transfer": transfer,
+    "completion": completion,
+    "suite": suite,
+}
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        print(f"Usage: python3 benchmark.py ({'|'.join(BENCHMARKS)}) [arguments...]")
+        sys.exit(1)
+    if sys.argv[1] == "suite":
+        suite(sys.argv[2:])
+        sys.exit(0)
+    arguments = [int(argument) for argument in sys.argv[2:]]
+    if sys.argv[1] == "memory":
+        arguments = arguments or [100000, 1000000]
+    elif sys.argv[1] == "listing":
+        arguments = arguments or [10000, 100000]
+    elif sys.argv[1] == "search":
+        arguments = arguments or [100000, 1000000]
+    elif sys.argv[1] == "startup":
+        arguments = arguments or [10000, 100000, 1000000]
+    elif sys.argv[1] == "daemon":
+        arguments = arguments or [10000, 100000]
+    elif sys.argv[1] == "transfer":
+        arguments = arguments or [10000, 100000]
+    elif sys.argv[1] == "completion":
+        arguments = arguments or [100000, 1000000]
+    BENCHMARKS[sys.argv[1]](arguments)